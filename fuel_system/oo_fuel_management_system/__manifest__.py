@@ -7,10 +7,11 @@
     "author": "Wanaag Solutions",
     "website": "https://github.com/mohamed-wanaag",
     "category": "Uncategorized",
-    "version": "19.0.1.0.0",
+    "version": "19.0.1.1.0",
     "depends": ["sale", "hr_expense", "stock", "sale_stock", "account", "purchase"],
     "application": True,
     "license": "LGPL-3",
+    "post_init_hook": "_post_init_shift_history",
     "data": [
         "security/security.xml",
         "security/ir.model.access.csv",
@@ -0,0 +1,16 @@
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """ Move existing stations to a dedicated shift sequence seeded from their counter, and
+    build the daily statistics of the existing shifts.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    stations = env['station.station'].with_context(active_test=False).search([('sequence_id', '=', False)])
+    stations._create_shift_sequence()
+    _logger.info('Created shift sequences for %s stations', len(stations))
+    env['fms.daily.stat']._rebuild()
@@ -0,0 +1,65 @@
+import logging
+
+_logger = logging.getLogger(__name__)
+
+SHIFT_LINE_TABLES = [
+    'shift_gun_sale_line',
+    'shift_dry_sale_line',
+    'shift_other_sale_line',
+    'shift_credit_sale_line',
+    'shift_direct_sale_line',
+    'shift_collection_line',
+    'shift_summary_line',
+    'shift_expense_line',
+    'shift_tank_stock_take',
+    'shift_petty_cash_line',
+    'shift_payment_line',
+    'shift_banking_line',
+    'shift_transfer_line',
+    'fms_variance_line',
+]
+
+
+def migrate(cr, version):
+    """ Create and backfill the stored station and date columns in SQL.
+
+    Creating the columns before the registry loads keeps the ORM from recomputing the new
+    related fields record by record.
+    """
+    for table in SHIFT_LINE_TABLES:
+        cr.execute(f"""
+            ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS station_id int4,
+                ADD COLUMN IF NOT EXISTS date date
+        """)
+        cr.execute(f"""
+            UPDATE {table} line
+               SET station_id = s.station_id,
+                   date = s.date
+              FROM station_shift s
+             WHERE s.id = line.shift_id
+        """)
+        _logger.info('Backfilled station and date on %s rows of %s', cr.rowcount, table)
+
+    _dedup_shift_history(cr)
+
+
+def _dedup_shift_history(cr):
+    """ Keep one shift history row per station, date and shift type before the UNIQUE constraint
+    is added, preferring the row linked to a shift, then the latest one.
+    """
+    cr.execute("SELECT to_regclass('shift_history') IS NOT NULL")
+    if not cr.fetchone()[0]:
+        return
+    cr.execute("""
+        DELETE FROM shift_history h
+         USING (
+            SELECT id, row_number() OVER (
+                       PARTITION BY station_id, date, type_id
+                       ORDER BY shift_id IS NULL, id DESC) AS rank
+              FROM shift_history
+         ) ranked
+         WHERE ranked.id = h.id
+           AND ranked.rank > 1
+    """)
+    _logger.info('Removed %s duplicate shift history rows', cr.rowcount)
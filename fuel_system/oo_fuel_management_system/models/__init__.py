@@ -2,6 +2,8 @@
 from . import station
 from . import shift_tracking
 from . import shift
+from . import daily_stats
+from . import report_cache
 from . import models
 from . import expenses
 from . import res_models
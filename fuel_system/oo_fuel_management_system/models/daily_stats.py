@@ -0,0 +1,199 @@
+import logging
+
+from odoo import models, fields, api
+from odoo.tools.sql import create_unique_index
+
+from .shift import GUN_NET_SALES_SQL, STAT_SHIFT_STATES
+
+_logger = logging.getLogger(__name__)
+
+
+STAT_CATEGORIES = [
+    ('fuel', 'Gun Sales'),
+    ('direct', 'Direct Sales'),
+    ('rtt', 'Returned to Tank'),
+    ('dry', 'Dry Sales'),
+    ('other', 'Other Sales'),
+    ('credit', 'Credit Sales'),
+    ('collection', 'Collections'),
+    ('expense', 'Expenses'),
+    ('payment', 'Payments'),
+    ('banking', 'Banking'),
+    ('variance', 'Dip Variance'),
+]
+
+# Scopes the statistics are deleted and rebuilt for, matched against the shift (alias s).
+STAT_SCOPE_SLOTS = """
+    (s.station_id, s.date) IN (SELECT * FROM unnest(%(station_ids)s::int4[], %(dates)s::date[]))
+"""
+STAT_SCOPE_RANGE = """
+    s.date BETWEEN %(date_from)s AND %(date_to)s
+    AND (%(station_ids)s::int4[] IS NULL OR s.station_id = ANY(%(station_ids)s::int4[]))
+"""
+
+# Line aggregates of the shifts of a ``shifts`` CTE (id, station_id, date, cash_banked), as
+# (station_id, date, product_id, category, quantity, amount) rows.
+STAT_LINES_QUERY = f"""
+        SELECT g.station_id, g.date, t.product_id, 'fuel' AS category,
+               SUM({GUN_NET_SALES_SQL}) AS quantity,
+               SUM(COALESCE(g.price_unit, 0) * {GUN_NET_SALES_SQL}) AS amount
+          FROM shift_gun_sale_line g
+          JOIN shifts sh ON sh.id = g.shift_id
+          JOIN station_station st ON st.id = g.station_id
+          JOIN station_gun gun ON gun.id = g.gun_id
+          JOIN station_tank t ON t.id = gun.tank_id
+         GROUP BY 1, 2, 3
+        UNION ALL
+        SELECT g.station_id, g.date, t.product_id, 'rtt',
+               SUM(COALESCE(g.rtt, 0)), SUM(COALESCE(g.price_unit, 0) * COALESCE(g.rtt, 0))
+          FROM shift_gun_sale_line g
+          JOIN shifts sh ON sh.id = g.shift_id
+          JOIN station_gun gun ON gun.id = g.gun_id
+          JOIN station_tank t ON t.id = gun.tank_id
+         GROUP BY 1, 2, 3
+        UNION ALL
+        SELECT d.station_id, d.date, t.product_id, 'direct',
+               SUM(COALESCE(d.quantity, 0)),
+               SUM((COALESCE(d.price_unit, 0) - COALESCE(d.discount, 0)) * COALESCE(d.quantity, 0))
+          FROM shift_direct_sale_line d
+          JOIN shifts sh ON sh.id = d.shift_id
+          JOIN station_tank t ON t.id = d.tank_id
+         GROUP BY 1, 2, 3
+        UNION ALL
+        SELECT d.station_id, d.date, d.product_id, 'dry',
+               SUM(COALESCE(d.quantity, 0)),
+               SUM((COALESCE(d.price_unit, 0) - COALESCE(d.discount, 0)) * COALESCE(d.quantity, 0))
+          FROM shift_dry_sale_line d
+          JOIN shifts sh ON sh.id = d.shift_id
+         GROUP BY 1, 2, 3
+        UNION ALL
+        SELECT o.station_id, o.date, o.product_id, 'other',
+               SUM(COALESCE(o.quantity, 0)),
+               SUM((COALESCE(o.price_unit, 0) - COALESCE(o.discount, 0)) * COALESCE(o.quantity, 0))
+          FROM shift_other_sale_line o
+          JOIN shifts sh ON sh.id = o.shift_id
+         GROUP BY 1, 2, 3
+        UNION ALL
+        SELECT c.station_id, c.date, c.product_id, 'credit',
+               SUM(COALESCE(c.quantity, 0)),
+               SUM((COALESCE(c.price_unit, 0) - COALESCE(c.discount, 0)) * COALESCE(c.quantity, 0))
+          FROM shift_credit_sale_line c
+          JOIN shifts sh ON sh.id = c.shift_id
+         GROUP BY 1, 2, 3
+        UNION ALL
+        SELECT c.station_id, c.date, NULL::int4, 'collection', 0, SUM(COALESCE(c.amount, 0))
+          FROM shift_collection_line c
+          JOIN shifts sh ON sh.id = c.shift_id
+         GROUP BY 1, 2
+        UNION ALL
+        SELECT e.station_id, e.date, NULL::int4, 'expense', 0, SUM(COALESCE(e.amount, 0))
+          FROM shift_expense_line e
+          JOIN shifts sh ON sh.id = e.shift_id
+         GROUP BY 1, 2
+        UNION ALL
+        SELECT p.station_id, p.date, NULL::int4, 'payment', 0, SUM(COALESCE(p.amount, 0))
+          FROM shift_payment_line p
+          JOIN shifts sh ON sh.id = p.shift_id
+         GROUP BY 1, 2
+        UNION ALL
+        SELECT sh.station_id, sh.date, NULL::int4, 'banking', 0, SUM(COALESCE(sh.cash_banked, 0))
+          FROM shifts sh
+         GROUP BY 1, 2
+        UNION ALL
+        SELECT sh.station_id, sh.date, t.product_id, 'variance',
+               SUM(COALESCE(tk.closing_dip_qty, 0) - (COALESCE(tk.opening_qty, 0)
+                   + COALESCE(tk.received_qty, 0) - COALESCE(tk.sales_qty, 0))), 0
+          FROM shift_tank_stock_take tk
+          JOIN shifts sh ON sh.id = tk.shift_id
+          JOIN station_tank t ON t.id = tk.tank_id
+         GROUP BY 1, 2, 3
+"""
+
+# Columns of the unique index the statistics are upserted on, product_id being nullable.
+STAT_KEY = "station_id, date, category, COALESCE(product_id, 0)"
+
+# Upsert one row per station, date, category and product, aggregated from the lines of counted
+# shifts, then delete the rows of the scope that no longer have any line.
+STAT_REFRESH_QUERY = f"""
+    WITH shifts AS (
+        SELECT s.id, s.station_id, s.date, s.cash_banked
+          FROM station_shift s
+         WHERE s.state IN %(states)s
+           AND {{scope}}
+    ), stats AS ({STAT_LINES_QUERY}
+    ), upserted AS (
+        INSERT INTO fms_daily_stat (station_id, date, product_id, category, quantity, amount,
+                                    create_uid, create_date, write_uid, write_date)
+        SELECT station_id, date, product_id, category, SUM(quantity), SUM(amount),
+               %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM stats
+         GROUP BY station_id, date, product_id, category
+            ON CONFLICT ({STAT_KEY}) DO UPDATE
+           SET quantity = EXCLUDED.quantity,
+               amount = EXCLUDED.amount,
+               write_uid = EXCLUDED.write_uid,
+               write_date = EXCLUDED.write_date
+        RETURNING id
+    ), removed AS (
+        DELETE FROM fms_daily_stat s
+         WHERE {{scope}}
+           AND s.id NOT IN (SELECT id FROM upserted)
+    )
+    SELECT COUNT(*) FROM upserted
+"""
+
+
+# Only the cash summary and the Daily Statistics views read these aggregates. The wet summary
+# needs each tank's first and last dip of the day, the credit summary and the daily report list
+# individual lines and orders, and the QWeb balance sheet is per shift: they keep their own
+# queries, scoped through the station and date columns and the shift_id indexes.
+class FmsDailyStat(models.Model):
+    _name = 'fms.daily.stat'
+    _description = 'FMS Daily Statistics'
+    _order = 'date desc, station_id, category, product_id'
+
+    station_id = fields.Many2one('station.station', string='Station', required=True, readonly=True, index=True)
+    date = fields.Date(string='Date', required=True, readonly=True, index=True)
+    company_id = fields.Many2one(related='station_id.company_id', string='Company')
+    category = fields.Selection(STAT_CATEGORIES, string='Category', required=True, readonly=True)
+    product_id = fields.Many2one('product.product', string='Product', readonly=True)
+    quantity = fields.Float(string='Quantity', readonly=True)
+    amount = fields.Float(string='Amount', readonly=True)
+
+    def init(self):
+        super().init()
+        # concurrent refreshes of the same station day upsert on it instead of duplicating rows
+        create_unique_index(self.env.cr, 'fms_daily_stat_key_uniq', self._table, [STAT_KEY])
+
+    def _execute_refresh(self, scope, params):
+        self.env.flush_all()
+        params = dict(params, states=STAT_SHIFT_STATES, uid=self.env.uid)
+        self.env.cr.execute(STAT_REFRESH_QUERY.format(scope=scope), params)
+        count = self.env.cr.fetchone()[0]
+        self.invalidate_model()
+        return count
+
+    @api.model
+    def _refresh_shifts(self, shifts):
+        """ Rebuild the statistics of the station days ``shifts`` belong to. """
+        slots = {(shift.station_id.id, shift.date) for shift in shifts if shift.station_id and shift.date}
+        if not slots:
+            return 0
+        station_ids, dates = zip(*slots)
+        return self._execute_refresh(STAT_SCOPE_SLOTS, {
+            'station_ids': list(station_ids),
+            'dates': list(dates),
+        })
+
+    @api.model
+    def _rebuild(self, date_from=None, date_to=None, stations=None):
+        """ Rebuild the statistics between ``date_from`` and ``date_to`` in SQL, for all stations by default. """
+        date_from = date_from or fields.Date.to_date('1970-01-01')
+        date_to = date_to or fields.Date.today()
+        count = self._execute_refresh(STAT_SCOPE_RANGE, {
+            'date_from': date_from,
+            'date_to': date_to,
+            'station_ids': stations.ids if stations else None,
+        })
+        _logger.info('Rebuilt %s daily statistics between %s and %s', count, date_from, date_to)
+        return count
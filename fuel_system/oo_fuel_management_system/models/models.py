@@ -1,5 +1,8 @@
+from collections import defaultdict
 from odoo import api, models, fields
 from odoo.exceptions import ValidationError
+from odoo.tools import float_compare
+from odoo.tools.sql import create_index
 
 
 class ProductPricelist(models.Model):
@@ -22,8 +25,9 @@ class FmsVarianceLine(models.Model):
     employee_id = fields.Many2one('hr.employee', string='Employee')
     name = fields.Char(string='Description')
     amount = fields.Float(string='Amount')
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    date = fields.Date(related='shift_id.date', string='Date')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     
     
 class ProductTemplate(models.Model):
@@ -49,20 +53,21 @@ class Product(models.Model):
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
     
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index='btree_not_null')
     station_id = fields.Many2one(related='shift_id.station_id', string='Station')
 
     def _prepare_invoice(self):
         res = super()._prepare_invoice()
         res['shift_id'] = self.shift_id.id
-        res['invoice_date'] = self._context.get('context_date', res.get('invoice_date'))
+        res['invoice_date'] = self._context.get('context_date') or self.shift_id.date or res.get('invoice_date')
         return res
     
     def _prepare_confirmation_values(self):
-        return {
-            'state': 'sale',
-            'date_order': self._context.get('context_date') or self.date_order or fields.Datetime.now()
-        }
+        # keep each order's own date so shift orders can be confirmed in batch
+        values = {'state': 'sale'}
+        if self._context.get('context_date'):
+            values['date_order'] = self._context['context_date']
+        return values
     
     
 class SaleOrderLine(models.Model):
@@ -81,25 +86,28 @@ class SaleOrderLine(models.Model):
 class AccountPayment(models.Model):
     _inherit = 'account.payment'
     
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index='btree_not_null')
     station_id = fields.Many2one(related='shift_id.station_id', string='Station')
 
     @api.model_create_multi
     def create(self, vals_list):
+        # browse the journals of the whole batch together so their method lines are read once
+        journals = {journal.id: journal for journal in self.env['account.journal'].browse(
+            {vals['journal_id'] for vals in vals_list})}
         for vals in vals_list:
-            journal = self.env['account.journal'].browse(vals['journal_id'])
+            journal = journals[vals['journal_id']]
             if vals['payment_type'] == 'inbound':
                 if not journal.inbound_payment_method_line_ids:
                     raise ValidationError(
                         f'Please define an inbound payment method line for the journal {journal.name}')
-                if not journal.inbound_payment_method_line_ids.filtered(lambda i: i.id == vals.get('payment_method_line_id')):
+                if vals.get('payment_method_line_id') not in journal.inbound_payment_method_line_ids.ids:
                     vals['payment_method_line_id'] = journal.inbound_payment_method_line_ids[0].id
                     
             if vals['payment_type'] == 'outbound':
                 if not journal.outbound_payment_method_line_ids:
                     raise ValidationError(
                         f'Please define an outbound payment method line for the journal {journal.name}')
-                if not journal.outbound_payment_method_line_ids.filtered(lambda i: i.id == vals.get('payment_method_line_id')):
+                if vals.get('payment_method_line_id') not in journal.outbound_payment_method_line_ids.ids:
                     vals['payment_method_line_id'] = journal.outbound_payment_method_line_ids[0].id
 
         return super().create(vals_list)
@@ -108,21 +116,27 @@ class AccountPayment(models.Model):
 class AccountMove(models.Model):
     _inherit = 'account.move'
     
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index='btree_not_null')
     station_id = fields.Many2one(related='shift_id.station_id', string='Station')
 
 
 class StockPicking(models.Model):
     _inherit = 'stock.picking'
     
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index='btree_not_null')
 
 
 class StockMoveLine(models.Model):
     _inherit = 'stock.move.line'
     
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index='btree_not_null')
     station_processed = fields.Boolean(string='Station Processed')
+
+    def init(self):
+        super().init()
+        # receive.move.wizard only offers done moves that no shift has processed yet
+        create_index(self.env.cr, 'stock_move_line_station_unprocessed_idx', self._table,
+                     ['location_dest_id'], where="station_processed IS NOT TRUE AND state = 'done'")
     
     
 class StockRule(models.Model):
@@ -131,4 +145,38 @@ class StockRule(models.Model):
     def _get_custom_move_fields(self):
         res = super()._get_custom_move_fields()
         res.extend(['location_id', 'date'])
-        return res
\ No newline at end of file
+        return res
+    
+    
+class StockQuant(models.Model):
+    _inherit = 'stock.quant'
+
+    @api.model
+    def _get_available_quantities(self, products, locations):
+        """ Snapshot of ``_get_available_quantity`` for every product and location pair.
+
+        Untracked products are resolved with one grouped quant query, child locations included.
+        Returns ``{(product_id, location_id): quantity}``.
+        """
+        quants = self.sudo()
+        totals = defaultdict(float)
+        if products and locations:
+            groups = quants._read_group(
+                [('product_id', 'in', products.ids), ('location_id', 'child_of', locations.ids)],
+                ['product_id', 'location_id'], ['quantity:sum', 'reserved_quantity:sum'])
+            for product, location, quantity, reserved in groups:
+                for parent in locations:
+                    if location.parent_path.startswith(parent.parent_path):
+                        totals[product.id, parent.id] += quantity - reserved
+
+        snapshot = {}
+        for product in products:
+            for location in locations:
+                if product.tracking != 'none':
+                    quantity = quants._get_available_quantity(product, location)
+                else:
+                    quantity = totals[product.id, location.id]
+                    if float_compare(quantity, 0, precision_rounding=product.uom_id.rounding) < 0:
+                        quantity = 0
+                snapshot[product.id, location.id] = quantity
+        return snapshot
@@ -0,0 +1,270 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+
+# Tables whose rows feed the analysis reports, all carrying a stored station_id and date.
+REPORT_VERSION_TABLES = [
+    'station_shift',
+    'shift_gun_sale_line',
+    'shift_dry_sale_line',
+    'shift_other_sale_line',
+    'shift_credit_sale_line',
+    'shift_direct_sale_line',
+    'shift_collection_line',
+    'shift_expense_line',
+    'shift_tank_stock_take',
+    'shift_payment_line',
+    'shift_banking_line',
+    'fms_daily_stat',
+]
+
+REPORT_VERSION_STATIONS = "(%(station_ids)s::int4[] IS NULL OR {} = ANY(%(station_ids)s::int4[]))"
+REPORT_VERSION_SHIFTS = f"""
+          JOIN station_shift s ON s.id = t.shift_id
+         WHERE s.date BETWEEN %(date_from)s AND %(date_to)s
+           AND {REPORT_VERSION_STATIONS.format('s.station_id')}"""
+
+# Products and partners the reports of the range render, by name, code or reference.
+REPORT_VERSION_PRODUCTS = f"""
+                SELECT c.product_id FROM shift_credit_sale_line c
+                 WHERE c.date BETWEEN %(date_from)s AND %(date_to)s
+                   AND {REPORT_VERSION_STATIONS.format('c.station_id')}
+                 UNION
+                SELECT sol.product_id FROM sale_order_line sol
+                  JOIN sale_order so ON so.id = sol.order_id
+                  JOIN station_shift s ON s.id = so.shift_id
+                 WHERE s.date BETWEEN %(date_from)s AND %(date_to)s
+                   AND {REPORT_VERSION_STATIONS.format('s.station_id')}
+                 UNION
+                SELECT ds.product_id FROM fms_daily_stat ds
+                 WHERE ds.date BETWEEN %(date_from)s AND %(date_to)s
+                   AND {REPORT_VERSION_STATIONS.format('ds.station_id')}"""
+REPORT_VERSION_PARTNERS = f"""
+                SELECT c.partner_id FROM shift_credit_sale_line c
+                 WHERE c.date BETWEEN %(date_from)s AND %(date_to)s
+                   AND {REPORT_VERSION_STATIONS.format('c.station_id')}
+                 UNION
+                SELECT so.partner_id FROM sale_order so
+                  JOIN station_shift s ON s.id = so.shift_id
+                 WHERE s.date BETWEEN %(date_from)s AND %(date_to)s
+                   AND {REPORT_VERSION_STATIONS.format('s.station_id')}"""
+
+# FROM clause of the rows (alias t) of each table a report in scope reads: the tables above, the
+# orders and invoices of the daily report reached through their shift, the products and partners
+# printed, and the station data.
+REPORT_VERSION_SOURCES = [(table, f"""
+          FROM {table} t
+         WHERE t.date BETWEEN %(date_from)s AND %(date_to)s
+           AND {REPORT_VERSION_STATIONS.format('t.station_id')}""") for table in REPORT_VERSION_TABLES] + [
+    ('sale_order', f"""
+          FROM sale_order t{REPORT_VERSION_SHIFTS}"""),
+    ('sale_order_line', f"""
+          FROM sale_order_line t
+          JOIN sale_order so ON so.id = t.order_id
+          JOIN station_shift s ON s.id = so.shift_id
+         WHERE s.date BETWEEN %(date_from)s AND %(date_to)s
+           AND {REPORT_VERSION_STATIONS.format('s.station_id')}"""),
+    ('account_move', f"""
+          FROM account_move t{REPORT_VERSION_SHIFTS}"""),
+    ('product_product', f"""
+          FROM product_product t
+         WHERE t.id IN ({REPORT_VERSION_PRODUCTS})"""),
+    ('product_template', f"""
+          FROM product_template t
+         WHERE t.id IN (SELECT pp.product_tmpl_id FROM product_product pp
+                         WHERE pp.id IN ({REPORT_VERSION_PRODUCTS}))"""),
+    ('res_partner', f"""
+          FROM res_partner t
+         WHERE t.id IN ({REPORT_VERSION_PARTNERS})"""),
+    ('station_tank', f"""
+          FROM station_tank t
+         WHERE {REPORT_VERSION_STATIONS.format('t.station_id')}"""),
+    ('station_station', f"""
+          FROM station_station t
+         WHERE {REPORT_VERSION_STATIONS.format('t.id')}"""),
+]
+
+REPORT_VERSION_QUERY = """
+    SELECT md5(string_agg(concat_ws(':', tbl, cnt, last_write), '|' ORDER BY tbl))
+      FROM ({}) versions
+""".format('\n        UNION ALL'.join(f"""
+        SELECT '{table}' AS tbl, COUNT(*) AS cnt, MAX(t.write_date) AS last_write{source}"""
+                                           for table, source in REPORT_VERSION_SOURCES))
+
+REPORT_CACHE_DAYS = 7
+
+REPORT_CHUNK_SIZE = 1024 * 1024
+
+
+class FmsReportCache(models.Model):
+    _name = 'fms.report.cache'
+    _description = 'FMS Generated Report Cache'
+    _order = 'last_used desc'
+    _rec_name = 'key'
+
+    key = fields.Char(string='Key', required=True, readonly=True, index=True)
+    report_type = fields.Char(string='Report Type', required=True, readonly=True)
+    station_ids = fields.Many2many('station.station', string='Stations', readonly=True)
+    station_scope = fields.Char(string='Station Scope', readonly=True,
+                                help="Sorted ids of the stations reported on, empty for all stations.")
+    date_from = fields.Date(string='Date From', readonly=True)
+    date_to = fields.Date(string='Date To', readonly=True)
+    lang = fields.Char(string='Language', readonly=True)
+    data_version = fields.Char(string='Data Version', readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', string='Report', readonly=True)
+    last_used = fields.Datetime(string='Last Used', readonly=True, default=fields.Datetime.now)
+
+    _sql_constraints = [
+        ('key_uniq', 'UNIQUE(key)', 'A cached report with the same key already exists.'),
+    ]
+
+    @api.model
+    def _get_data_version(self, stations, date_from, date_to):
+        """ Fingerprint the shifts, lines, statistics, orders and invoices of the range, the
+        products and partners they print and the stations' data: it changes whenever one is
+        added, removed or written, including on shift state changes.
+
+        This runs on every request, cache hits included. It costs a flush and one query that
+        counts the rows of the range on each source and takes their latest write date, found
+        through the date, station or shift_id indexes. No report is built.
+        """
+        self.env.flush_all()
+        self.env.cr.execute(REPORT_VERSION_QUERY, {
+            'station_ids': stations.ids or None,
+            'date_from': date_from,
+            'date_to': date_to,
+        })
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _prepare_key_values(self, report_type, stations, date_from, date_to):
+        values = {
+            'report_type': report_type,
+            'station_ids': [(6, 0, stations.ids)],
+            'station_scope': ','.join(str(station_id) for station_id in sorted(stations.ids)) or False,
+            'date_from': date_from,
+            'date_to': date_to,
+            'lang': self.env.lang or 'en_US',
+            'data_version': self._get_data_version(stations, date_from, date_to),
+        }
+        key = '|'.join(str(values[name] or '') for name in
+                       ('report_type', 'station_scope', 'date_from', 'date_to', 'lang', 'data_version'))
+        values['key'] = hashlib.sha256(key.encode()).hexdigest()
+        return values
+
+    @api.model
+    def _store_report_file(self, path):
+        """ Return the ir.attachment values storing the content of the file at ``path``.
+
+        ir.attachment only takes contents in memory. With the default file storage, the report
+        is instead hashed in chunks and copied into the filestore under its checksum, as
+        ``ir.attachment._file_write`` would, so that large reports are never loaded whole.
+        Other storages are given the raw content.
+        """
+        attachments = self.env['ir.attachment'].sudo()
+        if attachments._storage() != 'file':
+            with open(path, 'rb') as f:
+                return {'raw': f.read()}
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            while chunk := f.read(REPORT_CHUNK_SIZE):
+                sha.update(chunk)
+        checksum = sha.hexdigest()
+        fname, full_path = attachments._get_path(None, checksum)
+        if not os.path.exists(full_path):
+            shutil.copyfile(path, full_path)
+        return {'store_fname': fname, 'checksum': checksum, 'file_size': os.path.getsize(path)}
+
+    @api.model
+    def _prepare_attachment_values(self, filename, path, res_model, res_id):
+        return dict(
+            self._store_report_file(path),
+            name=filename,
+            res_model=res_model,
+            res_id=res_id,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+
+    @api.model
+    def _get_report(self, report_type, stations, date_from, date_to, generate):
+        """ Return the attachment of the report, calling ``generate(path)`` to write it to a
+        temporary file and return its file name only when no report was cached for the same
+        parameters and data version.
+        """
+        values = self._prepare_key_values(report_type, stations, date_from, date_to)
+        cache = self.sudo().search([('key', '=', values['key'])], limit=1)
+        if cache and cache.attachment_id:
+            cache.last_used = fields.Datetime.now()
+            return cache.attachment_id
+
+        fd, path = tempfile.mkstemp(suffix='.xlsx', prefix='fmsreport.')
+        os.close(fd)
+        try:
+            filename = generate(path)
+            return self._cache_report(values, filename, path)
+        finally:
+            os.unlink(path)
+
+    @api.model
+    def _cache_report(self, values, filename, path):
+        """ Store the report file at ``path`` as the cached report of ``values`` and return its attachment. """
+        try:
+            with self.env.cr.savepoint():
+                cache = self.sudo().create(values)
+        except IntegrityError:
+            # generated concurrently by another request, which stored it first
+            cache = self.sudo().search([('key', '=', values['key'])], limit=1)
+            if cache.attachment_id:
+                return cache.attachment_id
+            if not cache:
+                # committed after this transaction's snapshot was taken: serve this copy uncached,
+                # as a wizard attachment _gc_reports reclaims
+                return self.env['ir.attachment'].sudo().create(
+                    self._prepare_attachment_values(filename, path, 'fms.analysis', False))
+        cache.attachment_id = self.env['ir.attachment'].sudo().create(
+            self._prepare_attachment_values(filename, path, self._name, cache.id))
+        # earlier versions of the same report can no longer be hit
+        self.sudo().search([
+            ('id', '!=', cache.id),
+            ('report_type', '=', values['report_type']),
+            ('station_scope', '=', values['station_scope']),
+            ('date_from', '=', values['date_from']),
+            ('date_to', '=', values['date_to']),
+            ('lang', '=', values['lang']),
+        ]).unlink()
+        return cache.attachment_id
+
+    def unlink(self):
+        attachments = self.sudo().attachment_id
+        res = super().unlink()
+        attachments.unlink()
+        return res
+
+    @api.model
+    def _gc_reports(self):
+        """ Drop cached reports unused for REPORT_CACHE_DAYS and report attachments left without a record. """
+        limit = fields.Datetime.now() - timedelta(days=REPORT_CACHE_DAYS)
+        stale = self.sudo().search([('last_used', '<', limit)])
+        stale.unlink()
+
+        self.env.cr.execute("""
+            SELECT a.id
+              FROM ir_attachment a
+             WHERE (a.res_model = 'fms.analysis'
+                    AND NOT EXISTS (SELECT 1 FROM fms_analysis w WHERE w.id = a.res_id))
+                OR (a.res_model = 'fms.report.cache'
+                    AND NOT EXISTS (SELECT 1 FROM fms_report_cache c WHERE c.attachment_id = a.id))
+        """)
+        orphans = self.env['ir.attachment'].sudo().browse([row[0] for row in self.env.cr.fetchall()])
+        orphans.unlink()
+        _logger.info('Removed %s stale cached reports and %s orphaned report attachments', len(stale), len(orphans))
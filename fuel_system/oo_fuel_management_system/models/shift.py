@@ -4,6 +4,7 @@ from collections import defaultdict
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 from odoo.tools import float_compare, float_is_zero
+from odoo.tools.sql import create_index
 
 _logger = logging.getLogger(__name__)
 
@@ -18,6 +19,115 @@ STATES = [
     ('cancelled', 'Cancelled')
 ]
 
+# Shifts whose lines are final enough to be counted in the daily statistics.
+STAT_SHIFT_STATES = ('done', 'waiting_approval', 'approved', 'interfaced')
+
+PRICE_MEMO_KEY = 'oo_fuel_management_system.shift_prices'
+
+SUMMARY_FIELDS = [
+    'wet_quantity', 'lubes_quantity', 'lpg_quantity', 'others_quantity', 'discount',
+    'credit_sales', 'direct_sale', 'collections', 'expenses', 'cash_collected',
+]
+
+# Mirrors ShiftGunSales._compute_amount, including the fallback to the manual
+# meter difference when the electronic one is zero.
+GUN_NET_SALES_SQL = """
+    (CASE WHEN st.reading_type = 'electronic'
+               AND COALESCE(g.closing_reading, 0) - COALESCE(g.opening_reading, 0) != 0
+          THEN COALESCE(g.closing_reading, 0) - COALESCE(g.opening_reading, 0)
+          ELSE COALESCE(g.manual_closing_reading, 0) - COALESCE(g.manual_opening_reading, 0)
+     END - COALESCE(g.rtt, 0))
+"""
+
+SHIFT_SUMMARY_QUERY = f"""
+    SELECT g.shift_id, g.employee_id, 'wet_quantity',
+           SUM(COALESCE(g.price_unit, 0) * {GUN_NET_SALES_SQL})
+      FROM shift_gun_sale_line g
+      JOIN station_shift s ON s.id = g.shift_id
+      JOIN station_station st ON st.id = s.station_id
+     WHERE g.shift_id IN %(shift_ids)s
+     GROUP BY g.shift_id, g.employee_id
+    UNION ALL
+    SELECT d.shift_id, d.employee_id,
+           CASE pt.stock_type WHEN 'lube' THEN 'lubes_quantity' ELSE 'lpg_quantity' END,
+           SUM((COALESCE(d.price_unit, 0) - COALESCE(d.discount, 0)) * COALESCE(d.quantity, 0))
+      FROM shift_dry_sale_line d
+      JOIN product_product pp ON pp.id = d.product_id
+      JOIN product_template pt ON pt.id = pp.product_tmpl_id
+     WHERE d.shift_id IN %(shift_ids)s AND pt.stock_type IN ('lube', 'lpg')
+     GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT d.shift_id, d.employee_id, 'discount', SUM(COALESCE(d.discount, 0))
+      FROM shift_dry_sale_line d
+      JOIN product_product pp ON pp.id = d.product_id
+      JOIN product_template pt ON pt.id = pp.product_tmpl_id
+     WHERE d.shift_id IN %(shift_ids)s AND pt.stock_type IN ('lube', 'lpg')
+     GROUP BY d.shift_id, d.employee_id
+    UNION ALL
+    SELECT o.shift_id, o.employee_id, 'others_quantity',
+           SUM((COALESCE(o.price_unit, 0) - COALESCE(o.discount, 0)) * COALESCE(o.quantity, 0))
+      FROM shift_other_sale_line o
+     WHERE o.shift_id IN %(shift_ids)s
+     GROUP BY o.shift_id, o.employee_id
+    UNION ALL
+    SELECT o.shift_id, o.employee_id, 'discount', SUM(COALESCE(o.discount, 0))
+      FROM shift_other_sale_line o
+     WHERE o.shift_id IN %(shift_ids)s
+     GROUP BY o.shift_id, o.employee_id
+    UNION ALL
+    SELECT c.shift_id, c.employee_id, 'credit_sales',
+           SUM((COALESCE(c.price_unit, 0) - COALESCE(c.discount, 0)) * COALESCE(c.quantity, 0))
+      FROM shift_credit_sale_line c
+     WHERE c.shift_id IN %(shift_ids)s
+     GROUP BY c.shift_id, c.employee_id
+    UNION ALL
+    SELECT c.shift_id, c.employee_id,
+           CASE pt.stock_type WHEN 'lube' THEN 'lubes_quantity'
+                              WHEN 'lpg' THEN 'lpg_quantity'
+                              ELSE 'others_quantity' END,
+           SUM((COALESCE(c.price_unit, 0) - COALESCE(c.discount, 0)) * COALESCE(c.quantity, 0))
+      FROM shift_credit_sale_line c
+      JOIN product_product pp ON pp.id = c.product_id
+      JOIN product_template pt ON pt.id = pp.product_tmpl_id
+     WHERE c.shift_id IN %(shift_ids)s AND pt.stock_type IN ('lube', 'lpg', 'other')
+     GROUP BY 1, 2, 3
+    UNION ALL
+    SELECT d.shift_id, d.employee_id, 'direct_sale',
+           SUM((COALESCE(d.price_unit, 0) - COALESCE(d.discount, 0)) * COALESCE(d.quantity, 0))
+      FROM shift_direct_sale_line d
+     WHERE d.shift_id IN %(shift_ids)s
+     GROUP BY d.shift_id, d.employee_id
+    UNION ALL
+    SELECT l.shift_id, l.employee_id, 'collections', SUM(COALESCE(l.amount, 0))
+      FROM shift_collection_line l
+     WHERE l.shift_id IN %(shift_ids)s
+     GROUP BY l.shift_id, l.employee_id
+    UNION ALL
+    SELECT e.shift_id, e.employee_id, 'expenses', SUM(COALESCE(e.amount, 0))
+      FROM shift_expense_line e
+     WHERE e.shift_id IN %(shift_ids)s
+     GROUP BY e.shift_id, e.employee_id
+    UNION ALL
+    SELECT p.shift_id, p.employee_id, 'cash_collected', SUM(COALESCE(p.amount, 0))
+      FROM shift_payment_line p
+     WHERE p.shift_id IN %(shift_ids)s AND p.line_type = 'payment'
+     GROUP BY p.shift_id, p.employee_id
+"""
+
+
+def _price_key(pricelist, product, uom, date):
+    return pricelist.id, product.id, uom.id if uom else False, date
+
+
+def _journal_method_lines(method_lines, journal, payment_type):
+    """ ``payment_type`` method lines of ``journal``, read from the journal only when
+    ``method_lines`` (see ``StationShift._get_payment_method_lines``) did not resolve them.
+    """
+    journal_lines = (method_lines or {}).get(journal)
+    if journal_lines is None:
+        return journal[f'{payment_type}_payment_method_line_ids']
+    return journal_lines[payment_type]
+
 
 class StationShift(models.Model):
     _name = 'station.shift'
@@ -36,7 +146,7 @@ class StationShift(models.Model):
         string='Status', default='draft', selection=STATES, tracking=True)
     type_id = fields.Many2one('station.shift.type',
                               string='Shift Type', required=True, tracking=True, copy=False)
-    date = fields.Date(string='Date', required=True, tracking=True, copy=False)
+    date = fields.Date(string='Date', required=True, tracking=True, copy=False, index=True)
     name = fields.Char(string='Name', required=True,
                        default='/', readonly=True, copy=False, tracking=True)
     closing_warning = fields.Char(string='Closing Warning', compute='_compute_closing_warning', store=True)
@@ -50,36 +160,36 @@ class StationShift(models.Model):
     currency_id = fields.Many2one('res.currency', string='Currency', required=True)
     opening_balance = fields.Float(string='Opening Balance', readonly=True)
     cash_collected = fields.Float(
-        string='Cash Collected', compute='_compute_balances')
-    cash_banked = fields.Float(string='Cash Banked', compute='_compute_balances')
+        string='Cash Collected', compute='_compute_balances', store=True)
+    cash_banked = fields.Float(string='Cash Banked', compute='_compute_balances', store=True)
     closing_balance = fields.Float(
-        string='Closing Balance', compute='_compute_balances')
+        string='Closing Balance', compute='_compute_balances', store=True)
     petty_cash_opening = fields.Float(
         string='Opening Petty Cash', readonly=True)
     petty_cash_spent = fields.Float(
-        string='Petty Cash Spent', compute='_compute_balances')
+        string='Petty Cash Spent', compute='_compute_balances', store=True)
     petty_cash_reimbursed = fields.Float(string='Re-imbursed Petty Cash')
     total_expenses = fields.Float(
-        string='Expenses', compute='_compute_balances')
+        string='Expenses', compute='_compute_balances', store=True)
     closing_petty_cash = fields.Float(
-        string='Closing Petty Cash', compute='_compute_balances')
+        string='Closing Petty Cash', compute='_compute_balances', store=True)
     default_employee_id = fields.Many2one(
         'hr.employee', string='Default Dry Sales Employee', domain="[('station_ids', 'in', station_id)]")
 
     sale_ids = fields.Many2many('sale.order', string='Sales', readonly=True)
     sales_count = fields.Integer(
-        string='Sales Count', compute='_compute_transactions')
+        string='Sales Count', compute='_compute_transactions', store=True)
     move_ids = fields.Many2many('account.move', string='Moves', readonly=True)
     moves_count = fields.Integer(
-        string='Moves Count', compute='_compute_transactions')
+        string='Moves Count', compute='_compute_transactions', store=True)
     picking_ids = fields.Many2many(
         'stock.picking', string='Transfers', readonly=True)
     pickings_count = fields.Integer(
-        string='Pickings Count', compute='_compute_transactions')
+        string='Pickings Count', compute='_compute_transactions', store=True)
     payment_ids = fields.Many2many(
         'account.payment', string='Account Payments', readonly=True)
     payments_count = fields.Integer(
-        string='Payments Count', compute='_compute_transactions')
+        string='Payments Count', compute='_compute_transactions', store=True)
 
     gun_sale_line = fields.One2many(
         'shift.gun.sale.line', inverse_name='shift_id', string='Gun Sales')
@@ -113,6 +223,12 @@ class StationShift(models.Model):
          'Another shift for the same station already exists in the same perid and status'),
     ]
 
+    def init(self):
+        super().init()
+        # period lookups of _validate_start_shift, _constrains_shift_period and the reports
+        create_index(self.env.cr, 'station_shift_station_date_type_state_idx', self._table,
+                     ['station_id', 'date', 'type_id', 'state'])
+
     @property
     def is_station_accountant(self):
         return self.env.user.has_group('oo_fuel_management_system.group_station_management_manager')
@@ -138,9 +254,12 @@ class StationShift(models.Model):
                     please use the magic buttons below to manually validate'
 
     def _compute_user_access(self):
+        # the flags only depend on the current user: resolve them once for the whole recordset
+        is_admin = self.is_station_admin
+        can_approve = self.is_station_accountant
         for rec in self:
-            rec.is_admin = self.is_station_admin
-            rec.can_approve = self.is_station_accountant
+            rec.is_admin = is_admin
+            rec.can_approve = can_approve
 
     @api.depends('sale_ids', 'move_ids', 'picking_ids', 'payment_ids')
     def _compute_transactions(self):
@@ -152,12 +271,27 @@ class StationShift(models.Model):
 
     @api.model_create_multi
     def create(self, vals_list):
+        vals_by_station = defaultdict(list)
         for vals in vals_list:
-            station = self.env['station.station'].browse(vals['station_id'])
-            vals['name'] = f'FMS/{station.code}/{station.next_sequence:04}'
-            station.write({'next_sequence': station.next_sequence + 1})
+            vals_by_station[vals['station_id']].append(vals)
+        for station_id, station_vals in vals_by_station.items():
+            station = self.env['station.station'].browse(station_id)
+            for vals, name in zip(station_vals, station._next_shift_names(len(station_vals))):
+                vals['name'] = name
         return super().create(vals_list)
 
+    def write(self, vals):
+        # shifts entering or leaving the counted states, e.g. a done shift reopened by action_draft
+        stat_shifts = self.browse()
+        if 'state' in vals:
+            stat_shifts = self if vals['state'] in STAT_SHIFT_STATES else \
+                self.filtered(lambda s: s.state in STAT_SHIFT_STATES)
+        res = super().write(vals)
+        # batch operations writing shifts one by one refresh the statistics once at the end
+        if stat_shifts and not self.env.context.get('skip_daily_stat_refresh'):
+            self.env['fms.daily.stat']._refresh_shifts(stat_shifts)
+        return res
+
     @api.constrains('petty_cash_reimbursed', 'petty_cash_spent', 'petty_cash_opening')
     def _constrains_petty_cash(self):
         for rec in self:
@@ -207,33 +341,85 @@ class StationShift(models.Model):
         return self.env['shift.history'].linear_validate(self)
         
     def action_start(self):
+        to_start = self.env['station.shift']
         for rec in self:
-            history = rec._validate_start_shift()
-            if history:  
-                guns = self.env['station.gun'].search([('station_id', '=', rec.station_id.id)])
-                tanks = self.env['station.tank'].search([('station_id', '=', rec.station_id.id)])
-
-                guns = guns.filtered(lambda g: g.id not in rec.gun_sale_line.mapped('gun_id.id'))
-                tanks = tanks.filtered(lambda t: t.id not in rec.tank_stock_take_line.mapped('tank_id.id'))
-                rec.write({
-                    'gun_sale_line': [(0, 0, {'gun_id': gun.id}) for gun in guns],
-                    'tank_stock_take_line': [(0, 0, {'tank_id': tank.id, 'opening_qty': tank.current_volume}) for tank in tanks],
-                    'state': 'running',
-                    'opening_balance': self.station_id.closing_cash,
-                    'petty_cash_opening': self.station_id.last_shift_id.closing_petty_cash
-                })
-                rec.gun_sale_line._oncreate_populate()
-                rec.tank_stock_take_line._onchange_tank_id()
+            if rec._validate_start_shift():
+                to_start |= rec
             else:
-                self.has_starting_warning = True
-                self.show_starting_warning = True
+                rec.has_starting_warning = True
+                rec.show_starting_warning = True
+        to_start._start_shifts()
+
+    def _start_shifts(self):
+        """ Open the shifts together.
+
+        Guns, tanks and their last readings are loaded once for all stations and the gun and tank lines
+        are created with their opening values in one create per model; prices come from the price memo.
+        """
+        if not self:
+            return
+        stations = self.mapped('station_id')
+        guns = self.env['station.gun'].search([('tank_id.station_id', 'in', stations.ids)])
+        tanks = self.env['station.tank'].search([('station_id', 'in', stations.ids)])
+        guns_by_station = guns.grouped('station_id')
+        tanks_by_station = tanks.grouped('station_id')
+
+        gun_values = []
+        tank_values = []
+        for rec in self:
+            existing_guns = set(rec.gun_sale_line.mapped('gun_id').ids)
+            for gun in guns_by_station.get(rec.station_id, []):
+                if gun.id in existing_guns:
+                    continue
+                gun_values.append({
+                    'shift_id': rec.id,
+                    'gun_id': gun.id,
+                    'opening_reading': gun.last_reading,
+                    'closing_reading': gun.last_reading,
+                    'manual_opening_reading': gun.last_manual_reading,
+                    'manual_closing_reading': gun.last_manual_reading,
+                    'cash_opening_reading': gun.last_cash_reading,
+                    'cash_closing_reading': gun.last_cash_reading,
+                })
+            existing_tanks = set(rec.tank_stock_take_line.mapped('tank_id').ids)
+            for tank in tanks_by_station.get(rec.station_id, []):
+                if tank.id in existing_tanks:
+                    continue
+                tank_values.append({
+                    'shift_id': rec.id,
+                    'tank_id': tank.id,
+                    'opening_qty': tank.current_volume,
+                    'closing_dip_qty': tank.current_volume,
+                })
+
+        # lines left over from an earlier start are refreshed like the new ones
+        self.mapped('gun_sale_line')._oncreate_populate()
+        self.mapped('tank_stock_take_line')._onchange_tank_id()
+        self.env['shift.gun.sale.line'].create(gun_values)
+        self.env['shift.tank.stock.take'].create(tank_values)
+
+        for station, shifts in self.grouped('station_id').items():
+            shifts.write({
+                'state': 'running',
+                'opening_balance': station.closing_cash,
+                'petty_cash_opening': station.last_shift_id.closing_petty_cash
+            })
 
     def action_skip_starting_warning(self):
         self.show_starting_warning = False
         self.env['shift.history'].add_current(self)
         return self.action_start()
         
+    def _get_stock_snapshot(self):
+        """ Available quantities of every (product, location) pair the shifts touch. """
+        stations = self.mapped('station_id')
+        products = stations.tank_ids.product_id | self.dry_sale_line.product_id | self.received_stock_line.product_id
+        locations = stations.tank_ids.location_id | stations.dry_stock_location_id \
+            | stations.operation_type_id.default_location_src_id
+        return self.env['stock.quant']._get_available_quantities(products, locations)
+
     def _validate_product_availability(self):
+        snapshot = self._get_stock_snapshot()
         for rec in self:
             warning = 'Following products do not have enough availability \n'
             for tank in rec.station_id.tank_ids:
@@ -242,7 +428,7 @@ class StationShift(models.Model):
                 credit = sum(rec.credit_sale_line.filtered(lambda c: c.product_id == tank.product_id).mapped('quantity'))
                 incoming = sum(rec.received_stock_line.filtered(
                     lambda r: r.product_id == tank.product_id and r.location_id == tank.location_id).mapped('quantity'))
-                current_quantity = self.env['stock.quant']._get_available_quantity(tank.product_id, tank.location_id)
+                current_quantity = snapshot[tank.product_id.id, tank.location_id.id]
                 sales = gun_sale + direct + credit
                 forecast = current_quantity + incoming
                 if sales > forecast:
@@ -254,7 +440,7 @@ class StationShift(models.Model):
                 credit = sum(rec.credit_sale_line.filtered(lambda c: c.product_id == product).mapped('quantity'))
                 incoming = sum(rec.received_stock_line.filtered(
                     lambda r: r.product_id == product and r.location_id == rec.station_id.dry_stock_location_id).mapped('quantity'))
-                current_quantity = self.env['stock.quant']._get_available_quantity(product, rec.station_id.dry_stock_location_id)
+                current_quantity = snapshot[product.id, rec.station_id.dry_stock_location_id.id]
                 sales = sale + credit
                 forecast = incoming + current_quantity
                 if sales > forecast:
@@ -267,8 +453,9 @@ class StationShift(models.Model):
             raise ValidationError('Missing Employee in Gun sales')
         
         self.dry_sale_line._validate_lines()
+        snapshot = self._get_stock_snapshot()
         for line in self.received_stock_line:
-            line._validate_incoming_stock_availability()
+            line._validate_incoming_stock_availability(snapshot)
         
         self.gun_sale_line._compute_price()
         self.dry_sale_line._compute_price()
@@ -285,72 +472,54 @@ class StationShift(models.Model):
     def action_move_in_progress(self):
         self.write({'state': 'running'})
         
+    def _get_summary_values(self):
+        """ Aggregate the shift lines per shift and employee with a single grouped query.
+
+        Returns ``{shift_id: {employee_id: {summary_field: amount}}}``.
+        """
+        groups = defaultdict(lambda: defaultdict(dict))
+        if not self.ids:
+            return groups
+        self.env.flush_all()
+        self.env.cr.execute(SHIFT_SUMMARY_QUERY, {'shift_ids': tuple(self.ids)})
+        for shift_id, employee_id, field, amount in self.env.cr.fetchall():
+            values = groups[shift_id][employee_id or False]
+            values[field] = values.get(field, 0) + (amount or 0)
+        return groups
+
+    def _prepare_summary_commands(self, employee_values):
+        """ Diff the aggregated values against the existing summary lines. """
+        self.ensure_one()
+        commands = []
+        existing = {}
+        for line in self.summary_line:
+            if line.employee_id.id in existing:
+                commands.append((2, line.id))
+            else:
+                existing[line.employee_id.id] = line
+
+        for employee_id, values in employee_values.items():
+            values = {field: values.get(field, 0) for field in SUMMARY_FIELDS}
+            line = existing.pop(employee_id, None)
+            if line is None:
+                commands.append((0, 0, dict(values, employee_id=employee_id)))
+                continue
+            changes = {field: value for field, value in values.items() if line[field] != value}
+            changes and commands.append((1, line.id, changes))
+
+        commands.extend((2, line.id) for line in existing.values())
+        return commands
+
     def action_compute_shift(self):
         for rec in self:
             rec._validate_lines()
-            rec.summary_line = [(5, 0, 0)]
-            employee_group = defaultdict(dict)
-
-            for line in rec.gun_sale_line:
-                wet = employee_group[line.employee_id.id].get('wet_quantity', 0)
-                employee_group[line.employee_id.id]['wet_quantity'] = wet + line.amount
-
-            for line in rec.dry_sale_line:
-                if line.product_id.stock_type == 'lube':
-                    discount = employee_group[line.employee_id.id].get('discount', 0)
-                    lubes = employee_group[line.employee_id.id].get('lubes_quantity', 0)
-                    employee_group[line.employee_id.id]['lubes_quantity'] = lubes + line.amount
-                    employee_group[line.employee_id.id]['discount'] = discount + line.discount
-
-                if line.product_id.stock_type == 'lpg':
-                    discount = employee_group[line.employee_id.id].get('discount', 0)
-                    lpg = employee_group[line.employee_id.id].get('lpg_quantity', 0)
-                    employee_group[line.employee_id.id]['lpg_quantity'] = lpg + line.amount
-                    employee_group[line.employee_id.id]['discount'] = discount + line.discount
-
-            for line in rec.other_sale_line:
-                discount = employee_group[line.employee_id.id].get('discount', 0)
-                others = employee_group[line.employee_id.id].get('others_quantity', 0)
-                employee_group[line.employee_id.id]['others_quantity'] = others + line.amount
-                employee_group[line.employee_id.id]['discount'] = discount + line.discount
-
-            for line in rec.credit_sale_line:
-                credit = employee_group[line.employee_id.id].get('credit_sales', 0)
-                employee_group[line.employee_id.id]['credit_sales'] = credit + line.amount
-
-                if line.product_id.stock_type == 'lube':
-                    lubes = employee_group[line.employee_id.id].get('lubes_quantity', 0)
-                    employee_group[line.employee_id.id]['lubes_quantity'] = lubes + line.amount
-
-                if line.product_id.stock_type == 'lpg':
-                    lpg = employee_group[line.employee_id.id].get('lpg_quantity', 0)
-                    employee_group[line.employee_id.id]['lpg_quantity'] = lpg + line.amount
-
-                if line.product_id.stock_type == 'other':
-                    others = employee_group[line.employee_id.id].get('others_quantity', 0)
-                    employee_group[line.employee_id.id]['others_quantity'] = others + line.amount
-
-            for line in rec.direct_sale_line:
-                direct = employee_group[line.employee_id.id].get('direct_sale', 0)
-                employee_group[line.employee_id.id]['direct_sale'] = direct + line.amount
-
-            for line in rec.collection_line:
-                collected = employee_group[line.employee_id.id].get('collections', 0)
-                employee_group[line.employee_id.id]['collections'] = collected + line.amount
-
-            for line in rec.expense_line:
-                expense = employee_group[line.employee_id.id].get('expenses', 0)
-                employee_group[line.employee_id.id]['expenses'] = expense + line.amount
-
-            for line in rec.payment_line.filtered(lambda b: b.line_type == 'payment'):
-                cash_collected = employee_group[line.employee_id.id].get('cash_collected', 0)
-                employee_group[line.employee_id.id]['cash_collected'] = cash_collected + line.amount
-
-            for _id, group in employee_group.items():
-                group['employee_id'] = _id
-
-            summary_line = list(map(lambda c: (0, 0, c), employee_group.values()))
-            rec.write({'summary_line': summary_line, 'opening_balance': self.station_id.closing_cash})
+
+        summary_values = self._get_summary_values()
+        for rec in self:
+            rec.write({
+                'summary_line': rec._prepare_summary_commands(summary_values[rec.id]),
+                'opening_balance': rec.station_id.closing_cash,
+            })
             rec.tank_stock_take_line._calculate_tank_operations()
             rec.summary_line._compute_amounts()
 
@@ -362,74 +531,105 @@ class StationShift(models.Model):
         self._validate_product_availability()
         self.write({'state': 'done', 'opening_balance': self.station_id.closing_cash})
 
-    def _validate_orders(self, group):
+    def _validate_orders(self, orders):
+        """ Confirm, deliver and invoice the orders of one or many shifts as a single batch. """
+        if not orders:
+            return self.env['account.move']
+        orders.action_confirm()
+        pickings = orders.mapped('picking_ids')
+        if not pickings:
+            return self.env['account.move']
+
+        pickings.action_confirm()
+        pickings.action_assign()
+        if any(pickings.mapped('show_check_availability')):
+            raise ValidationError("Some of the selected products have no availability!")
+
+        pickings.with_context(skip_sms=True, skip_immediate=True).button_validate()
+        # one invoice per order, dated on its shift (see SaleOrder._prepare_invoice)
+        return orders.filtered('picking_ids')._create_invoices(grouped=True)
+
+    def _get_line_index(self):
+        """ Group the shift lines once so sale line builders and closing checks stay linear. """
         self.ensure_one()
-        orders = self.env['sale.order']
-        moves = self.env['account.move']
+        index = {
+            'credit_qty': defaultdict(float),
+            'credit_product_qty': defaultdict(float),
+            'expenses': defaultdict(float),
+            'gun_sales': defaultdict(float),
+        }
+        for line in self.credit_sale_line:
+            index['credit_qty'][line.product_id.id, line.employee_id.id] += line.quantity
+            index['credit_product_qty'][line.product_id.id] += line.quantity
+        for line in self.expense_line:
+            index['expenses'][line.employee_id.id] += line.amount
+        for line in self.gun_sale_line:
+            index['gun_sales'][line.tank_id.id] += line.net_sales
+        return index
 
-        for partner, lines in group.items():
-            order = self.env['sale.order'].create({
-                'partner_id': partner,
-                'date_order': self.date,
-                'shift_id': self.id,
-                'warehouse_id': self.station_id.warehouse_id.id,
-                'pricelist_id': self.station_id.pricelist_id.id,
-                'order_line': lines,
-            })
-            orders |= order
-            date_ctx = {'context_date': self.date}
-            order.with_context(date_ctx).action_confirm()
-            if order.picking_ids:
-                order.picking_ids.action_confirm()
-                order.picking_ids.action_assign()
-                if any(order.picking_ids.mapped('show_check_availability')):
-                    raise ValidationError("Some of the selected products have no availability!")
-
-                order.picking_ids.with_context(skip_sms=True, skip_immediate=True).button_validate()
-                moves |= order.with_context(date_ctx)._create_invoices()
-        return orders, moves
+    def _prepare_order_values(self, group):
+        self.ensure_one()
+        return [{
+            'partner_id': partner,
+            'date_order': self.date,
+            'shift_id': self.id,
+            'warehouse_id': self.station_id.warehouse_id.id,
+            'pricelist_id': self.station_id.pricelist_id.id,
+            'order_line': lines,
+        } for partner, lines in group.items()]
 
-    def _process_sales(self):
+    def _prepare_sale_orders(self):
+        """ Return ``(order values, is cash sale)`` pairs for the shift sale lines. """
         self.ensure_one()
         credit_group = defaultdict(list)
         direct_tank_sale_group = defaultdict(list)
         partner_group = defaultdict(list)
-        orders = self.env['sale.order']
-        invoices = self.env['account.move']
+        index = self._get_line_index()
 
         for line in self.credit_sale_line:
             vals = line._make_sale_line()
             vals and credit_group[vals.pop('partner_id')].append((0, 0, vals))
-        order, invoice = self._validate_orders(credit_group)
-        orders |= order
-        invoices |= invoice
 
         for line in self.direct_sale_line:
             vals = line._make_sale_line()
             vals and direct_tank_sale_group[vals.pop('partner_id')].append((0, 0, vals))
-        order, invoice = self._validate_orders(direct_tank_sale_group)
-        orders |= order
-        invoices |= invoice
 
-        gun_lines, cash_partner = self.gun_sale_line._make_grouped_product_line()
+        gun_lines, cash_partner = self.gun_sale_line._make_grouped_product_line(index)
         partner_group[cash_partner.id].extend([(0, 0, gline) for gline in gun_lines])
 
         for line in self.dry_sale_line:
-            vals = line._make_sale_line()
+            vals = line._make_sale_line(index)
             vals and partner_group[vals.pop('partner_id')].append((0, 0, vals))
 
         for line in self.other_sale_line:
-            vals = line._make_sale_line()
+            vals = line._make_sale_line(index)
             vals and partner_group[vals.pop('partner_id')].append((0, 0, vals))
-        order, invoices_to_pay = self._validate_orders(partner_group)
-        orders |= order
-        invoices |= invoices_to_pay
-        self.write({
-            'move_ids': [(4, inv.id) for inv in invoices],
-            'sale_ids': [(4, order.id) for order in orders],
-            'picking_ids': [(4, pick.id) for pick in orders.mapped('picking_ids')]
-        })
-        return invoices_to_pay
+
+        orders = []
+        for group, is_cash in ((credit_group, False), (direct_tank_sale_group, False), (partner_group, True)):
+            orders.extend((vals, is_cash) for vals in self._prepare_order_values(group))
+        return orders
+
+    def _process_sales(self):
+        order_values = []
+        cash_indexes = []
+        for rec in self:
+            for vals, is_cash in rec._prepare_sale_orders():
+                is_cash and cash_indexes.append(len(order_values))
+                order_values.append(vals)
+
+        orders = self.env['sale.order'].create(order_values)
+        invoices = self._validate_orders(orders)
+        cash_orders = self.env['sale.order'].browse([orders[index].id for index in cash_indexes])
+
+        invoices_by_shift = invoices.grouped('shift_id')
+        for shift, shift_orders in orders.grouped('shift_id').items():
+            shift.write({
+                'move_ids': [(4, inv.id) for inv in invoices_by_shift.get(shift, [])],
+                'sale_ids': [(4, order.id) for order in shift_orders],
+                'picking_ids': [(4, pick.id) for pick in shift_orders.mapped('picking_ids')]
+            })
+        return invoices & cash_orders.invoice_ids
 
     def _prepare_move_line_values(self, lines, dest_account, reference):
         line_ids = []
@@ -465,10 +665,11 @@ class StationShift(models.Model):
             'journal_id': journal_id.id,
             'shift_id': self.id,
         }
-    
-    def _process_excess_liability(self, moves, amount):
+
+    def _prepare_excess_liability_values(self, amount):
+        self.ensure_one()
         if float_is_zero(amount, precision_digits=2):
-            return moves
+            return []
         reference = f'{self.name} Variance Excess'
         vals = self._prepare_move_values(
             self.station_id.unbanked_journal_id, reference, self.station_id.cash_partner_id.id)
@@ -488,13 +689,13 @@ class StationShift(models.Model):
                 'currency_id': self.currency_id.id
             })
         ]
-        moves |= self.env['account.move'].create(vals)
-        return moves
+        return [vals]
 
-    def process_credit_notes(self):
+    def _prepare_credit_note_values(self):
         # Expenses and loss variances will create a credit note kind of JE
+        self.ensure_one()
         variance_status = self.summary_line._variance_status()
-        moves = self.env['account.move']
+        values = []
         lines = []
         for line in self.expense_line:
             lines.append((0, 0, {
@@ -508,9 +709,9 @@ class StationShift(models.Model):
                 'price_unit': variance_status['loss'],
                 'account_id': self.station_id.loss_account_id.id,
             }))
-        
+
         if lines:
-            vals = {
+            values.append({
                 'move_type': 'out_refund',
                 'state': 'draft',
                 'company_id': self.company_id.id,
@@ -521,84 +722,161 @@ class StationShift(models.Model):
                 'journal_id': self.station_id.expense_journal_id.id,
                 'shift_id': self.id,
                 'invoice_line_ids': lines
-            }
-            moves |= self.env['account.move'].create(vals)
-        moves = self._process_excess_liability(moves, variance_status['liability'])
-        return moves
+            })
+        values.extend(self._prepare_excess_liability_values(variance_status['liability']))
+        return values
 
-    def process_petty_cash(self):
-        moves = self.env['account.move']
+    def _prepare_petty_cash_values(self):
+        values = []
         for rec in self.filtered('petty_line'):
             journal = rec.station_id.petty_cash_journal_id
-            vals = self._prepare_move_values(journal, f'{rec.name} | Petty Cash')
+            vals = rec._prepare_move_values(journal, f'{rec.name} | Petty Cash')
             vals['line_ids'] = rec._prepare_move_line_values(
                 rec.petty_line, journal.default_account_id, f'{rec.name} | Petty Cash')
-            moves |= self.env['account.move'].create(vals)
-        return moves
+            values.append(vals)
+        return values
 
-    def process_payments(self):
-        payments = self.env['account.payment']
-        payments_to_pay = self.env['account.payment']
-        payments |= self.env['account.payment'].create(self.banking_line._make_banking_payment_line())
-        for line in self.collection_line:
-            payments |= self.env['account.payment'].create(line._make_payment_line())
+    def _get_payment_method_lines(self):
+        """ Inbound and outbound payment method lines of every journal the shifts pay into. """
+        journals = self.mapped('collection_line.journal_id') | self.mapped('payment_line.journal_id') \
+            | self.mapped('station_id.unbanked_journal_id')
+        return {
+            journal: {
+                'inbound': journal.inbound_payment_method_line_ids,
+                'outbound': journal.outbound_payment_method_line_ids,
+            } for journal in journals
+        }
 
-        payments_to_pay |= self.env['account.payment'].create(
-            self.payment_line._make_grouped_journal_payment_line())
+    def process_payments(self):
+        values = []
+        to_pay_values = []
+        method_lines = self._get_payment_method_lines()
+        for rec in self:
+            values.extend(rec.banking_line._make_banking_payment_line(method_lines))
+            values.extend(line._make_payment_line(method_lines) for line in rec.collection_line)
+            to_pay_values.extend(rec.payment_line._make_grouped_journal_payment_line(method_lines))
 
-        payments |= payments_to_pay
+        payments = self.env['account.payment'].create(values + to_pay_values)
+        payments_to_pay = payments[len(values):]
         payments and payments.filtered(lambda d: d.state == 'draft').action_post()
         return payments, payments_to_pay
 
     def _process_moves(self, moves_to_pay, payment):
-        expense_move = self.process_credit_notes()
-        moves = self.process_petty_cash()
-        moves |= expense_move
+        expense_values = []
+        for rec in self:
+            expense_values.extend(rec._prepare_credit_note_values())
+        petty_values = self._prepare_petty_cash_values()
+        moves = self.env['account.move'].create(expense_values + petty_values)
+        expense_move = moves[:len(expense_values)]
         moves and moves._post()
 
         moves_to_pay |= expense_move.filtered(lambda m: m.move_type != 'out_invoice')
         if not moves_to_pay or not payment:
             return moves
-        lines = moves_to_pay.mapped('line_ids')
-        dest_accounts = payment.mapped('destination_account_id')
-        lines |= payment.mapped('line_ids')
+        lines = moves_to_pay.mapped('line_ids') | payment.mapped('line_ids')
         lines.filtered(lambda ln: ln.move_id.state != 'posted').mapped('move_id')._post(soft=False)
-        lines.filtered(
-            lambda line: line.account_id in dest_accounts and not line.reconciled).reconcile()
+
+        # reconcile shift by shift so entries of different shifts are never matched together
+        payments_by_shift = payment.grouped('shift_id')
+        for shift, shift_moves in moves_to_pay.grouped('shift_id').items():
+            shift_payments = payments_by_shift.get(shift)
+            if not shift_payments:
+                continue
+            dest_accounts = shift_payments.mapped('destination_account_id')
+            (shift_moves.mapped('line_ids') | shift_payments.mapped('line_ids')).filtered(
+                lambda line: line.account_id in dest_accounts and not line.reconciled).reconcile()
         return moves
 
     def action_request_approval(self):
         self.write({'state': 'waiting_approval'})
 
-    def action_post(self):
-        self.opening_balance = self.station_id.closing_cash
+    def _sorted_for_posting(self):
+        """ Return the shifts in the order they must be posted for their balances to chain. """
+        return self.sorted(lambda s: (s.date, s.type_id.sequence, s.id))
+
+    def _post_transactions(self):
+        """ Post the given shifts together: one create per model, bulk posting and reconciliation. """
+        # carry the cash balance forward in shift order so several shifts of a station chain correctly
+        for rec in self._sorted_for_posting():
+            rec.opening_balance = rec.station_id.closing_cash
+            rec.station_id.write({'last_shift_id': rec.id})
+
         self.received_stock_line.do_pickings()
         moves_to_pay = self._process_sales()
         payments, payment_to_pay = self.process_payments()
         moves = self._process_moves(moves_to_pay, payment_to_pay)
 
-        self.station_id.write(
-            {'closing_cash': self.closing_balance, 'last_shift_id': self.id})
         self.summary_line._close()
-        self.write({
-            'state': 'interfaced',
-            'move_ids': [(4, move.id) for move in moves],
-            'payment_ids': [(4, pay.id) for pay in payments],
-            'picking_ids': [(4, pick.id) for pick in self.received_stock_line.mapped('picking_id')],
-        })
+        moves_by_shift = moves.grouped('shift_id')
+        payments_by_shift = payments.grouped('shift_id')
+        for rec in self:
+            rec.with_context(skip_daily_stat_refresh=True).write({
+                'state': 'interfaced',
+                'move_ids': [(4, move.id) for move in moves_by_shift.get(rec, [])],
+                'payment_ids': [(4, pay.id) for pay in payments_by_shift.get(rec, [])],
+                'picking_ids': [(4, pick.id) for pick in rec.received_stock_line.mapped('picking_id')],
+            })
         # ? refactor: why this hack
         self.move_ids.filtered(lambda d: d.state == 'draft')._post()
+        if not self.env.context.get('skip_daily_stat_refresh'):
+            self.env['fms.daily.stat']._refresh_shifts(self)
+
+    def action_post(self):
+        self._post_transactions()
+
+    def action_post_batch(self):
+        """ Post many approved shifts at once, possibly across stations.
+
+        All shifts are first posted together. If that fails, every shift is posted on its own
+        savepoint so that the failing ones are rolled back and reported without losing the others.
+        """
+        failures = {}
+        # the statistics of the posted shifts are refreshed once, after all attempts
+        shifts = self.with_context(skip_daily_stat_refresh=True)
+        try:
+            with self.env.cr.savepoint():
+                shifts._post_transactions()
+        except Exception:
+            if len(self) == 1:
+                raise
+            failed_stations = {}
+            for rec in shifts._sorted_for_posting():
+                # a later shift would open on the balance of the shift that failed before it
+                if rec.station_id in failed_stations:
+                    failures[rec] = f'Skipped, earlier shift {failed_stations[rec.station_id].name} failed'
+                    continue
+                try:
+                    with self.env.cr.savepoint():
+                        rec._post_transactions()
+                except Exception as error:
+                    _logger.warning('Failed to post shift %s: %s', rec.name, error)
+                    failures[rec] = str(error)
+                    failed_stations[rec.station_id] = rec
+
+        for rec, error in failures.items():
+            rec.message_post(body=f'Posting failed: {error}')
+
+        posted = self - self.browse([rec.id for rec in failures])
+        self.env['fms.daily.stat']._refresh_shifts(posted)
+        message = f'{len(posted)} shift(s) posted.'
+        if failures:
+            message += ' Failed: ' + '; '.join(f'{rec.name}: {error}' for rec, error in failures.items())
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Post Transactions',
+                'message': message,
+                'type': 'warning' if failures else 'success',
+                'sticky': bool(failures),
+            }
+        }
 
     def action_cancel(self):
         self.write({'state': 'cancelled'})
 
     def _update_gun_last_reading(self):
-        for line in self.mapped('gun_sale_line'):
-            line.gun_id.write({
-                'last_reading': line.closing_reading,
-                'last_manual_reading': line.manual_closing_reading,
-                'last_cash_reading': line.cash_closing_reading
-            })
+        self.mapped('gun_sale_line')._carry_forward_readings()
             
     def action_approve(self):
         self._update_gun_last_reading()
@@ -607,10 +885,51 @@ class StationShift(models.Model):
     def action_reject(self):
         self.write({'state': 'done'})
 
-    def _compute_price_unit(self, product, uom=False):
-        return self.station_id.pricelist_id._get_product_price(product=product, uom=uom, date=self.date, quantity=1)
+    def _get_price_memo(self):
+        """ Prices resolved in the current transaction, keyed by (pricelist, product, uom, date). """
+        cr = self.env.cr
+        memo = cr.cache.get(PRICE_MEMO_KEY)
+        if memo is None:
+            memo = cr.cache[PRICE_MEMO_KEY] = {}
+
+            def clear():
+                cr.cache.pop(PRICE_MEMO_KEY, None)
+            cr.precommit.add(clear)
+            cr.postrollback.add(clear)
+        return memo
+
+    def _prefetch_prices(self):
+        """ Price every product of the shifts with one pricelist evaluation per pricelist, uom and date. """
+        memo = self._get_price_memo()
+        to_price = defaultdict(lambda: self.env['product.product'])
+        for rec in self:
+            pricelist = rec.station_id.pricelist_id
+            for line in rec.gun_sale_line.filtered('gun_id'):
+                to_price[pricelist, line.tank_id.uom_id, rec.date] |= line.gun_id.product_id
+            products = rec.dry_sale_line.mapped('product_id') | rec.other_sale_line.mapped('product_id') \
+                | rec.credit_sale_line.mapped('product_id') | rec.direct_sale_line.mapped('product_id')
+            to_price[pricelist, self.env['uom.uom'], rec.date] |= products
+
+        for (pricelist, uom, date), products in to_price.items():
+            products = products.filtered(lambda p: _price_key(pricelist, p, uom, date) not in memo)
+            if not products:
+                continue
+            prices = pricelist._get_products_price(products, quantity=1, uom=uom, date=date)
+            for product in products:
+                memo[_price_key(pricelist, product, uom, date)] = prices.get(product.id, 0)
 
-    @api.depends('banking_line', 'summary_line', 'opening_balance', 'petty_line')
+    def _compute_price_unit(self, product, uom=False):
+        pricelist = self.station_id.pricelist_id
+        memo = self._get_price_memo()
+        key = _price_key(pricelist, product, uom, self.date)
+        if key not in memo:
+            memo[key] = pricelist._get_product_price(product=product, uom=uom, date=self.date, quantity=1)
+        return memo[key]
+
+    @api.depends('banking_line.amount', 'banking_line.line_type',
+                 'payment_line.amount', 'payment_line.line_type', 'payment_line.journal_id',
+                 'station_id.unbanked_journal_id', 'opening_balance', 'petty_line.amount',
+                 'expense_line.amount', 'petty_cash_opening', 'petty_cash_reimbursed')
     def _compute_balances(self):
         for rec in self:
             rec.cash_banked = sum(rec.banking_line.filtered(lambda b: b.line_type == 'banking').mapped('amount'))
@@ -661,9 +980,9 @@ class ShiftGunSales(models.Model):
     _name = 'shift.gun.sale.line'
     _description = 'Station Shift Gun Sales'
 
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(
-        related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(
         related='shift_id.company_id', string='Company')
     employee_id = fields.Many2one(
@@ -727,6 +1046,7 @@ class ShiftGunSales(models.Model):
 
     @api.depends('gun_id', 'shift_id.date')
     def _compute_price(self):
+        self.mapped('shift_id')._prefetch_prices()
         for rec in self:
             if rec.gun_id:
                 rec.price_unit = rec.shift_id._compute_price_unit(rec.gun_id.product_id, rec.tank_id.uom_id)
@@ -734,9 +1054,64 @@ class ShiftGunSales(models.Model):
                 rec.price_unit = 0
 
     def _oncreate_populate(self):
-        for rec in self:
-            rec._onchange_gun_id()
-            rec._compute_price()
+        self._load_gun_readings()
+        self._compute_price()
+
+    def _carry_forward_readings(self):
+        """ Store the closing readings of the lines as their guns' last readings with one UPDATE.
+
+        When several shifts hold the same gun, the most recent shift wins.
+        """
+        if not self:
+            return
+        gun_fields = ['last_reading', 'last_manual_reading', 'last_cash_reading']
+        self.flush_recordset(['gun_id', 'closing_reading', 'manual_closing_reading', 'cash_closing_reading'])
+        self.env['station.gun'].flush_model(gun_fields)
+        self.env.cr.execute("""
+            UPDATE station_gun g
+               SET last_reading = l.closing_reading,
+                   last_manual_reading = l.manual_closing_reading,
+                   last_cash_reading = l.cash_closing_reading,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM (
+                    SELECT DISTINCT ON (line.gun_id)
+                           line.gun_id, line.closing_reading, line.manual_closing_reading, line.cash_closing_reading
+                      FROM shift_gun_sale_line line
+                      JOIN station_shift s ON s.id = line.shift_id
+                      JOIN station_shift_type t ON t.id = s.type_id
+                     WHERE line.id IN %s
+                     ORDER BY line.gun_id, s.date DESC, t.sequence DESC, line.id DESC
+                   ) l
+             WHERE g.id = l.gun_id
+         RETURNING g.id
+        """, (self.env.uid, tuple(self.ids)))
+        guns = self.env['station.gun'].browse([row[0] for row in self.env.cr.fetchall()])
+        guns.invalidate_recordset(gun_fields + ['write_uid', 'write_date'])
+        guns.modified(gun_fields)
+
+    def _load_gun_readings(self):
+        """ Seed opening and closing readings from the guns' last readings with one UPDATE. """
+        if not self:
+            return
+        reading_fields = ['opening_reading', 'closing_reading', 'manual_opening_reading',
+                          'manual_closing_reading', 'cash_opening_reading', 'cash_closing_reading']
+        # pending reading values would otherwise be flushed over the UPDATE on invalidation
+        self.flush_recordset(['gun_id'] + reading_fields)
+        self.env['station.gun'].flush_model(['last_reading', 'last_manual_reading', 'last_cash_reading'])
+        self.env.cr.execute("""
+            UPDATE shift_gun_sale_line l
+               SET opening_reading = COALESCE(g.last_reading, 0),
+                   closing_reading = COALESCE(g.last_reading, 0),
+                   manual_opening_reading = COALESCE(g.last_manual_reading, 0),
+                   manual_closing_reading = COALESCE(g.last_manual_reading, 0),
+                   cash_opening_reading = COALESCE(g.last_cash_reading, 0),
+                   cash_closing_reading = COALESCE(g.last_cash_reading, 0)
+              FROM station_gun g
+             WHERE g.id = l.gun_id AND l.id IN %s
+        """, (tuple(self.ids),))
+        self.invalidate_recordset(reading_fields)
+        self.modified(reading_fields)
 
     def _validate_closing(self):
         for rec in self:
@@ -747,10 +1122,11 @@ class ShiftGunSales(models.Model):
                     continue
                 raise ValidationError('Manual and electronic gun difference cannot exceed allowable gun difference')
 
-    def _make_grouped_product_line(self):
+    def _make_grouped_product_line(self, index=None):
         shift = self.mapped('shift_id')
         if len(shift) > 1:
             raise ValidationError('Please compute one shift at a time')
+        index = index or shift._get_line_index()
         products = {}
         for line in self:
             product = line.gun_id.product_id
@@ -767,8 +1143,7 @@ class ShiftGunSales(models.Model):
                 }
         
         for product in products:
-            credit = shift.credit_sale_line.filtered(lambda c: c.product_id == product).mapped('quantity')
-            products[product]['product_uom_qty'] -= sum(credit)
+            products[product]['product_uom_qty'] -= index['credit_product_qty'][product.id]
         return list(products.values()), shift.station_id.cash_partner_id
     
 
@@ -788,8 +1163,9 @@ class ShiftDrySales(models.Model):
     uom_category_id = fields.Many2one(related='product_id.uom_id.relative_uom_id')
     price_unit = fields.Float(string='Unit Price', compute='_compute_price', store=True)
     amount = fields.Float(string='Amount', compute='_compute_amount', inverse='_inverse_compute_amount')
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     partner_id = fields.Many2one(related='station_id.cash_partner_id', string='Customer')
     employee_id = fields.Many2one(
@@ -821,13 +1197,16 @@ class ShiftDrySales(models.Model):
             
     @api.onchange('product_id', 'partner_id')
     def _onchange_product_id(self):
-        for rec in self.filtered('product_id'):
+        lines = self.filtered('product_id')
+        snapshot = self.env['stock.quant']._get_available_quantities(
+            lines.mapped('product_id'), lines.mapped('station_id.dry_stock_location_id'))
+        for rec in lines:
             rec.uom_id = rec.product_id.uom_id
-            rec.before_quantity = self.env['stock.quant']._get_available_quantity(
-                rec.product_id, rec.station_id.dry_stock_location_id)
+            rec.before_quantity = snapshot.get((rec.product_id.id, rec.station_id.dry_stock_location_id.id), 0)
 
     @api.depends('product_id', 'partner_id', 'shift_id.date')
     def _compute_price(self):
+        self.mapped('shift_id')._prefetch_prices()
         for rec in self:
             if rec.product_id:
                 rec.price_unit = rec.shift_id._compute_price_unit(rec.product_id)
@@ -844,11 +1223,10 @@ class ShiftDrySales(models.Model):
         if self.filtered(lambda d: d.after_quantity < 0):
             raise ValidationError('Dry stock remaining quantity cannot be less than 0')
         
-    def _make_sale_line(self):
+    def _make_sale_line(self, index=None):
         self.ensure_one()
-        credit_sales = self.shift_id.credit_sale_line.filtered(
-            lambda c: c.product_id == self.product_id and c.employee_id == self.employee_id).mapped('quantity')
-        qty = self.quantity - sum(credit_sales)
+        index = index or self.shift_id._get_line_index()
+        qty = self.quantity - index['credit_qty'][self.product_id.id, self.employee_id.id]
         if qty <= 0:
             return
         return {
@@ -876,8 +1254,9 @@ class ShiftOtherSales(models.Model):
     uom_category_id = fields.Many2one(related='product_id.uom_id.relative_uom_id')
     price_unit = fields.Float(string='Unit Price', compute="_compute_price", store=True)
     amount = fields.Float(string='Amount', compute='_compute_amount', inverse='_inverse_compute_amount')
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     partner_id = fields.Many2one(related='station_id.cash_partner_id', string='Customer')
     employee_id = fields.Many2one(
@@ -917,17 +1296,17 @@ class ShiftOtherSales(models.Model):
 
     @api.depends('product_id', 'shift_id.date')
     def _compute_price(self):
+        self.mapped('shift_id')._prefetch_prices()
         for rec in self:
             if rec.product_id:
-                rec.price_unit = rec.shift_id._compute_price_unit(rec.product_id, date=rec.shift_id.date)
+                rec.price_unit = rec.shift_id._compute_price_unit(rec.product_id)
             else:
                 rec.price_unit = 0
 
-    def _make_sale_line(self):
+    def _make_sale_line(self, index=None):
         self.ensure_one()
-        credit_sales = self.shift_id.credit_sale_line.filtered(
-            lambda c: c.product_id == self.product_id and c.employee_id == self.employee_id).mapped('quantity')
-        qty = self.quantity - sum(credit_sales)
+        index = index or self.shift_id._get_line_index()
+        qty = self.quantity - index['credit_qty'][self.product_id.id, self.employee_id.id]
         if qty <= 0:
             return
         location_id = self.station_id.warehouse_id.lot_stock_id
@@ -954,9 +1333,9 @@ class ShiftCreditSales(models.Model):
     _name = 'shift.credit.sale.line'
     _description = 'Station Shift Credit Sales'
 
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
-    date = fields.Date(related='shift_id.date', string='Date')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     product_id = fields.Many2one('product.product',
                                  string='Product',
                                  required=True,
@@ -1013,6 +1392,7 @@ class ShiftCreditSales(models.Model):
 
     @api.depends('product_id', 'shift_id.date')
     def _compute_price(self):
+        self.mapped('shift_id')._prefetch_prices()
         for rec in self:
             if rec.product_id:
                 rec.price_unit = rec.shift_id._compute_price_unit(rec.product_id)
@@ -1047,9 +1427,9 @@ class ShiftDirectSales(models.Model):
     _name = 'shift.direct.sale.line'
     _description = 'Station Shift Direct Sales'
 
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(
-        related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     tank_id = fields.Many2one(
         'station.tank', string='Tank', domain="[('station_id', '=', station_id)]")
     product_id = fields.Many2one(
@@ -1100,6 +1480,7 @@ class ShiftDirectSales(models.Model):
 
     @api.depends('product_id', 'shift_id.date')
     def _compute_price(self):
+        self.mapped('shift_id')._prefetch_prices()
         for rec in self:
             if rec.product_id:
                 rec.price_unit = rec.shift_id._compute_price_unit(rec.product_id)
@@ -1127,8 +1508,9 @@ class ShiftCollection(models.Model):
     _name = 'shift.collection.line'
     _description = 'Station Shift Collections'
 
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     currency_id = fields.Many2one(related='shift_id.currency_id', string='Currency')
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     employee_id = fields.Many2one(
@@ -1150,12 +1532,12 @@ class ShiftCollection(models.Model):
         for rec in self:
             rec.journal_id = rec.station_id.unbanked_journal_id
 
-    def _make_payment_line(self):
+    def _make_payment_line(self, method_lines=None):
         self.ensure_one()
         if self.amount <= 0:
             raise ValidationError('Collection amount must be positive')
         journal = self.journal_id
-        payment_methods = journal.inbound_payment_method_line_ids
+        payment_methods = _journal_method_lines(method_lines, journal, 'inbound')
         if not payment_methods:
             raise ValidationError(f'Please define an inbound payment method for the journal {journal.name}')
 
@@ -1168,7 +1550,7 @@ class ShiftCollection(models.Model):
             'date': self.shift_id.date,
             'ref': f"{self.name or self.shift_id.name} Collection",
             'payment_type': 'inbound',
-            'payment_method_line_id': payment_methods[0].payment_method_id.id,
+            'payment_method_line_id': payment_methods[0].id,
         }
 
 
@@ -1176,8 +1558,9 @@ class ShiftSummary(models.Model):
     _name = 'shift.summary.line'
     _description = 'Shift Summary'
 
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     employee_id = fields.Many2one(
         'hr.employee', string='Employee', required=True, domain="[('station_ids', 'in', station_id)]")
@@ -1205,9 +1588,9 @@ class ShiftSummary(models.Model):
             rec.variance = (rec.expected_cash - rec.cash_collected) * -1
                 
     def _validate_closing(self):
+        indexes = {shift: shift._get_line_index() for shift in self.mapped('shift_id')}
         for line in self:
-            expense = line.shift_id.expense_line.filtered(lambda s: s.employee_id == line.employee_id)
-            expense_amount = sum(expense.mapped('amount'))
+            expense_amount = indexes[line.shift_id]['expenses'][line.employee_id.id]
             if expense_amount > line.expected_cash:
                 raise ValidationError(
                     f"{line.employee_id.name}'s expenses cannot exceed their total cash collected")
@@ -1250,8 +1633,9 @@ class ShiftExpenseLine(models.Model):
     name = fields.Char(string='Name', required=True)
     employee_id = fields.Many2one('hr.employee', string='Employee', domain="[('station_ids', 'in', station_id)]")
     amount = fields.Monetary('Amount', currency_field="currency_id")
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     currency_id = fields.Many2one(related='shift_id.currency_id', string='Currency')
 
@@ -1260,8 +1644,9 @@ class ShiftTankStockTake(models.Model):
     _name = 'shift.tank.stock.take'
     _description = 'Shift Tank Dippings'
 
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     tank_id = fields.Many2one('station.tank', string='Tank', required=True,
                               domain="[('station_id', '=', station_id)]")
     location_id = fields.Many2one(related='tank_id.location_id', string='Stock Location')
@@ -1304,9 +1689,9 @@ class ShiftTankStockTake(models.Model):
             rec.tank_id.write({'current_volume': rec.closing_dip_qty})
 
     def _update_pump_sales(self):
+        indexes = {shift: shift._get_line_index() for shift in self.mapped('shift_id')}
         for rec in self:
-            rec.sales_qty = sum(
-                rec.shift_id.gun_sale_line.filtered(lambda g: g.tank_id == rec.tank_id).mapped('net_sales'))
+            rec.sales_qty = indexes[rec.shift_id]['gun_sales'][rec.tank_id.id]
 
     def _get_received_quantities(self):
         for rec in self:
@@ -1328,8 +1713,9 @@ class ShiftPettyCashLine(models.Model):
         domain="[('can_be_expensed', '=', True), ('company_id', 'in', (company_id, False))]")
     name = fields.Char(string='Name', required=True)
     amount = fields.Monetary('Amount', currency_field="currency_id")
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     currency_id = fields.Many2one(related='shift_id.currency_id', string='Currency')
 
@@ -1340,14 +1726,15 @@ class ShiftPaymentLine(models.Model):
 
     name = fields.Char(string='Reference')
     amount = fields.Monetary('Amount', currency_field="currency_id")
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
     # Todo: deprecate line type column
     line_type = fields.Selection(string='Line Type',
                                  selection=[('banking', 'Banking'), ('payment', 'Payment')],
                                  default='payment',
                                  required=True)
     employee_id = fields.Many2one('hr.employee', string='Employee')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     currency_id = fields.Many2one(related='shift_id.currency_id', string='Currency')
     journal_id = fields.Many2one(
@@ -1365,7 +1752,7 @@ class ShiftPaymentLine(models.Model):
         for rec in self:
             rec.available_journal_ids = rec.station_id.payment_mode_ids.ids
 
-    def _make_grouped_journal_payment_line(self):
+    def _make_grouped_journal_payment_line(self, method_lines=None):
         payments = {}
         for rec in self.filtered(lambda p: p.line_type == 'payment'):
             if rec.amount <= 0:
@@ -1373,7 +1760,7 @@ class ShiftPaymentLine(models.Model):
             if payments.get(rec.journal_id):
                 payments[rec.journal_id]['amount'] += rec.amount
             else:
-                payment_methods = rec.journal_id.inbound_payment_method_line_ids
+                payment_methods = _journal_method_lines(method_lines, rec.journal_id, 'inbound')
                 if not payment_methods:
                     raise ValidationError(
                         f'Please define an inbound payment method for the journal {rec.journal_id.name}')
@@ -1397,14 +1784,15 @@ class ShiftBankingLine(models.Model):
 
     name = fields.Char(string='Reference', required=True)
     amount = fields.Monetary('Amount', currency_field="currency_id")
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
     # Todo: deprecate line type column
     line_type = fields.Selection(string='Line Type',
                                  selection=[('banking', 'Banking'), ('payment', 'Payment')],
                                  default='banking',
                                  required=True)
     employee_id = fields.Many2one('hr.employee', string='Employee')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     currency_id = fields.Many2one(related='shift_id.currency_id', string='Currency')
     journal_id = fields.Many2one(
@@ -1421,7 +1809,7 @@ class ShiftBankingLine(models.Model):
         for rec in self:
             rec.available_journal_ids = rec.station_id.journal_ids.ids
 
-    def _make_banking_payment_line(self):
+    def _make_banking_payment_line(self, method_lines=None):
         payments = {}
         for rec in self.filtered(lambda p: p.line_type == 'banking'):
             if rec.amount <= 0:
@@ -1430,7 +1818,7 @@ class ShiftBankingLine(models.Model):
                 payments[rec.journal_id]['amount'] += rec.amount
             else:
                 journal = rec.station_id.unbanked_journal_id
-                payment_methods = journal.outbound_payment_method_line_ids
+                payment_methods = _journal_method_lines(method_lines, journal, 'outbound')
                 if not payment_methods:
                     raise ValidationError(
                         f'Please define an outbound payment method for the journal {journal.name}')
@@ -1453,8 +1841,9 @@ class ShiftTransferLine(models.Model):
     _name = 'shift.transfer.line'
     _description = 'Shift received stocks'
 
-    shift_id = fields.Many2one('station.shift', string='Shift')
-    station_id = fields.Many2one(related='shift_id.station_id', string='Station')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
+    station_id = fields.Many2one(related='shift_id.station_id', string='Station', store=True, index=True)
+    date = fields.Date(related='shift_id.date', string='Date', store=True, index=True)
     company_id = fields.Many2one(related='shift_id.company_id', string='Company')
     product_id = fields.Many2one('product.product', string='Product', required=True,
                                  domain="[('id', 'in', available_product_ids)]")
@@ -1534,11 +1923,12 @@ class ShiftTransferLine(models.Model):
             'shift_id': self.shift_id.id,
         }
 
-    def _validate_incoming_stock_availability(self):
+    def _validate_incoming_stock_availability(self, snapshot=None):
         self.ensure_one()
-        quantity = self.env['stock.quant']._get_available_quantity(
-            self.product_id, self.station_id.operation_type_id.default_location_src_id
-        )
+        source = self.station_id.operation_type_id.default_location_src_id
+        if snapshot is None:
+            snapshot = self.env['stock.quant']._get_available_quantities(self.product_id, source)
+        quantity = snapshot.get((self.product_id.id, source.id), 0)
         if quantity < self.quantity:
             raise ValidationError(
                 f'You cannot receive more quantity than there is for product {self.product_id.name}')
@@ -1546,14 +1936,28 @@ class ShiftTransferLine(models.Model):
             raise ValidationError('Some Receiving stock lines have no driver or truck')
 
     def do_pickings(self):
+        """ Receive the lines with one picking per shift, source, destination and operation type.
+
+        Availability was already checked by ``station.shift._validate_lines`` when the shift was closed.
+        """
+        groups = defaultdict(lambda: self.env['shift.transfer.line'])
         for rec in self:
-            rec._validate_incoming_stock_availability()
-            picking = self.env['stock.picking'].create(rec._prepare_picking_values())
-            self.env['stock.move'].create(rec._prepare_stock_move_values(picking))
-            picking.action_confirm()
-            picking.action_assign()
-            picking.with_context(skip_sms=True, skip_immediate=True).button_validate()
-            rec.picking_id = picking
+            picking_type = rec.station_id.operation_type_id
+            groups[rec.shift_id, picking_type.default_location_src_id, rec.location_id, picking_type] |= rec
+        if not groups:
+            return
+
+        grouped_lines = list(groups.values())
+        pickings = self.env['stock.picking'].create([lines[0]._prepare_picking_values() for lines in grouped_lines])
+        move_values = []
+        for picking, lines in zip(pickings, grouped_lines):
+            lines.write({'picking_id': picking.id})
+            move_values.extend(line._prepare_stock_move_values(picking) for line in lines)
+        self.env['stock.move'].create(move_values)
+
+        pickings.action_confirm()
+        pickings.action_assign()
+        pickings.with_context(skip_sms=True, skip_immediate=True).button_validate()
             
     @api.ondelete(at_uninstall=False)
     def _unlink_processed_moves(self):
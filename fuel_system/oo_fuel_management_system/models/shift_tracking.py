@@ -1,7 +1,7 @@
 import logging
 from datetime import timedelta
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 
 _logger = logging.getLogger(__name__)
@@ -15,6 +15,30 @@ class StationShiftType(models.Model):
     name = fields.Char(string='Name', required=True)
     sequence = fields.Integer(string='Sequnce', required=True)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        res = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return res
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache()
+    def _get_ordered_types(self):
+        """ ``(id, sequence)`` of the active shift types, in the order shifts follow each other. """
+        # explicit domain: the cached result must not depend on the active_test of the caller
+        types = self.sudo().with_context(active_test=False).search([('active', '=', True)], order='sequence, id')
+        return tuple((rec.id, rec.sequence) for rec in types)
+
     @api.ondelete(at_uninstall=False)
     def _ondelete(self):
         shifts = self.env['station.shift'].search([('type_id', 'in', self.ids)])
@@ -29,53 +53,41 @@ class ShiftHistory(models.Model):
     _rec_name = 'shift_id'
 
     station_id = fields.Many2one('station.station', string='Station', required=True)
-    shift_id = fields.Many2one('station.shift', string='Shift')
+    shift_id = fields.Many2one('station.shift', string='Shift', index=True)
     type_id = fields.Many2one('station.shift.type', string='Shift Type', required=True)
     date = fields.Date(string='Date', required=True)
     sequence = fields.Integer(string='Sequence', required=True)
     state = fields.Selection(related='shift_id.state', string='Shift Status')
 
-    @api.constrains('station_id', 'date', 'type_id', 'state')
-    def _constrains_history(self):
-        for rec in self:
-            history = self.search(
-                [('station_id', '=', rec.station_id.id),
-                 ('date', '=', rec.date),
-                 ('type_id', '=', rec.type_id.id),
-                 ('id', '!=', rec.id)
-                 ])
-            if history:
-                raise ValidationError(f'A shift history with the same station, period and date already exists.\
-                    You might need to cancel this shift and create a new one {history.id}')
-    
-    @api.model_create_multi
-    def create(self, vals_list):
-        res = super().create(vals_list)
-        for rec in res:
-            rec.station_id.write({'shift_history_ids': [(4, rec.id)]})
-        return res
-    
+    _sql_constraints = [
+        ('station_date_type_uniq', 'UNIQUE(station_id, date, type_id)',
+         'A shift history with the same station, period and date already exists. '
+         'You might need to cancel this shift and create a new one'),
+    ]
+
     def next_history(self, shift):
-        next_type = self.env['station.shift.type'].search(
-            [('id', '!=', shift.type_id.id), ('sequence', '>', shift.type_id.sequence)],
-            order='sequence', limit=1)
+        shift_types = self.env['station.shift.type']._get_ordered_types()
+        next_type_id, next_sequence = next(
+            ((type_id, sequence) for type_id, sequence in shift_types
+             if type_id != shift.type_id.id and sequence > shift.type_id.sequence),
+            (False, 0))
         next_date = shift.date
-        if not next_type:
+        if not next_type_id:
             next_date = next_date + timedelta(days=1)
-            next_type = self.env['station.shift.type'].search([], order='sequence', limit=1)
+            next_type_id, next_sequence = shift_types and shift_types[0] or (False, 0)
         history = self.search(
                 [('station_id', '=', shift.station_id.id),
                  ('date', '=', next_date),
-                 ('type_id', '=', next_type.id),
+                 ('type_id', '=', next_type_id),
                  ('shift_id', '=', False),
                  ])
         if history:
             return history
         vals = {
-            'type_id': next_type.id,
+            'type_id': next_type_id,
             'date': next_date,
             'station_id': shift.station_id.id,
-            'sequence': next_type.sequence,
+            'sequence': next_sequence,
         }
         _logger.info(f'Adding next shift from shift {shift} with vals {vals}')
         return self.create(vals)
@@ -98,8 +110,37 @@ class ShiftHistory(models.Model):
         _logger.info(f'Adding shift {shift} with vals {vals}')
         return self.create(vals)
 
+    @api.model
+    def _backfill_from_shifts(self):
+        """ Insert the missing history rows of existing shifts with a single INSERT ... SELECT.
+
+        Slots that already have a history row are skipped, so this can be re-run at any time.
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            INSERT INTO shift_history (station_id, shift_id, type_id, date, sequence,
+                                       create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT ON (s.station_id, s.date, s.type_id)
+                   s.station_id, s.id, s.type_id, s.date, t.sequence,
+                   %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+              FROM station_shift s
+              JOIN station_shift_type t ON t.id = s.type_id
+             WHERE NOT EXISTS (
+                    SELECT 1
+                      FROM shift_history h
+                     WHERE h.station_id = s.station_id
+                       AND h.date = s.date
+                       AND h.type_id = s.type_id)
+             ORDER BY s.station_id, s.date, s.type_id, s.state = 'cancelled', s.id DESC
+            ON CONFLICT DO NOTHING
+        """, {'uid': self.env.uid})
+        count = self.env.cr.rowcount
+        self.env['station.station'].invalidate_model(['shift_history_ids'])
+        _logger.info('Backfilled %s shift history rows', count)
+        return count
+
     def linear_validate(self, shift):
-        if not self.search([]):
+        if not self.search([], limit=1):
             # if this is the first shift then start a new sequence
             return self.next_history(shift)
             
@@ -1,5 +1,6 @@
 import re
 from odoo import models, fields, api, Command
+from odoo.exceptions import ValidationError
 
 
 class FuelStation(models.Model):
@@ -8,7 +9,10 @@ class FuelStation(models.Model):
 
     name = fields.Char(string='Name', required=True)
     code = fields.Char(string='Code', required=True, size=4)
-    next_sequence = fields.Integer(string='Next Sequence', default=1)
+    next_sequence = fields.Integer(string='Next Sequence', default=1,
+                                   help="Shift number the station sequence starts from. It can later be moved "
+                                        "forward, never back to numbers already used.")
+    sequence_id = fields.Many2one('ir.sequence', string='Shift Sequence', readonly=True, copy=False)
     warehouse_id = fields.Many2one(
         'stock.warehouse', string='Warehouse', required=True, domain="[('company_id', 'in', (company_id, False))]")
     partner_id = fields.Many2one(
@@ -49,7 +53,7 @@ class FuelStation(models.Model):
     pricelist_id = fields.Many2one('product.pricelist', string='Pricelist', required=True)
     last_shift_id = fields.Many2one('station.shift', string='Last Shift', readonly=True, copy=False)
     last_shift_date = fields.Date(string='Last Shift Date', related='last_shift_id.date', copy=False)
-    closing_cash = fields.Float(string='Closing Cash', related='last_shift_id.closing_balance', copy=False)
+    closing_cash = fields.Float(string='Closing Cash', related='last_shift_id.closing_balance', store=True, copy=False)
     operation_type_id = fields.Many2one('stock.picking.type', 
                                         string='Operation Type',
                                         required=True,
@@ -74,15 +78,71 @@ class FuelStation(models.Model):
         help="Station payments loss will be posted into this account")
     allowable_cash_variance = fields.Monetary(string='Allowed Cash Variance', currency_field='currency_id')
     product_ids = fields.Many2many('product.product', string='Products', compute='_compute_product_ids')
-    shift_history_ids = fields.Many2many('shift.history',
-                                         string='Station Shift History',
-                                         domain=lambda s: [('station_id', '=', s.id)],
-                                         readonly=True)
+    shift_history_ids = fields.One2many('shift.history', 'station_id',
+                                        string='Station Shift History',
+                                        readonly=True)
     
     _sql_constraints = [
         ('code_uniq', 'UNIQUE(code, company_id)', 'Code must be unique per company'),
     ]
     
+    @api.model_create_multi
+    def create(self, vals_list):
+        stations = super().create(vals_list)
+        stations._create_shift_sequence()
+        return stations
+
+    def write(self, vals):
+        if vals.get('next_sequence'):
+            for rec in self.filtered('sequence_id'):
+                # moving the sequence back would hand out shift names already used
+                if vals['next_sequence'] < rec.sequence_id.number_next_actual:
+                    raise ValidationError(
+                        f'The next shift number of {rec.name} cannot be lower than '
+                        f'{rec.sequence_id.number_next_actual}, already reached by its shifts.')
+        res = super().write(vals)
+        if 'code' in vals:
+            for rec in self.filtered('sequence_id'):
+                rec.sequence_id.sudo().write({'prefix': f'FMS/{rec.code}/'})
+        if vals.get('next_sequence'):
+            # moves the sequence shift names are drawn from forward
+            for rec in self.filtered('sequence_id'):
+                rec.sequence_id.sudo().write({'number_next': rec.next_sequence or 1})
+        return res
+
+    def _create_shift_sequence(self):
+        """ Give each station its own shift sequence, starting from ``next_sequence``.
+
+        Shift names are drawn from the sequence, so creating shifts never locks the station row.
+        """
+        for rec in self:
+            rec.sequence_id = self.env['ir.sequence'].sudo().create({
+                'name': f'{rec.name} Shifts',
+                'code': 'station.shift',
+                'prefix': f'FMS/{rec.code}/',
+                'padding': 4,
+                'number_next': rec.next_sequence or 1,
+                'implementation': 'standard',
+                'company_id': rec.company_id.id,
+            })
+        return self.sequence_id
+
+    def _next_shift_names(self, count):
+        """ Reserve ``count`` shift names from the station sequence.
+
+        Standard sequences are backed by the PostgreSQL sequence ``ir_sequence_<id>`` that
+        ``ir.sequence._next_do`` draws from, so all the numbers are reserved in a single query.
+        Sequences changed to no gap or date ranges go through the ``ir.sequence`` API instead.
+        """
+        self.ensure_one()
+        sequence = (self.sequence_id or self._create_shift_sequence()).sudo()
+        if sequence.implementation != 'standard' or sequence.use_date_range:
+            return [sequence._next() for _ in range(count)]
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            ['ir_sequence_%03d' % sequence.id, count])
+        return [sequence.get_next_char(number) for number, in self.env.cr.fetchall()]
+
     def _compute_product_ids(self):
         product = self.env['product.product']
         for rec in self:
@@ -1,49 +1,131 @@
 from odoo import models, api
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+
+
+# Line totals of the daily summary per shift. Payment rows are split by journal, every
+# other row has a NULL journal.
+DAILY_SUMMARY_QUERY = """
+    SELECT l.shift_id, 'wet', NULL::int4, SUM(l.wet_quantity)
+      FROM shift_summary_line l WHERE l.shift_id IN %(shift_ids)s GROUP BY l.shift_id
+    UNION ALL
+    SELECT l.shift_id, 'collections', NULL, SUM(l.collections)
+      FROM shift_summary_line l WHERE l.shift_id IN %(shift_ids)s GROUP BY l.shift_id
+    UNION ALL
+    SELECT l.shift_id, 'total_sales', NULL, SUM(l.total_sales)
+      FROM shift_summary_line l WHERE l.shift_id IN %(shift_ids)s GROUP BY l.shift_id
+    UNION ALL
+    SELECT l.shift_id, 'variance', NULL, SUM(l.variance)
+      FROM shift_summary_line l WHERE l.shift_id IN %(shift_ids)s GROUP BY l.shift_id
+    UNION ALL
+    SELECT d.shift_id, 'dry', NULL,
+           SUM((COALESCE(d.price_unit, 0) - COALESCE(d.discount, 0)) * COALESCE(d.quantity, 0))
+      FROM shift_dry_sale_line d WHERE d.shift_id IN %(shift_ids)s GROUP BY d.shift_id
+    UNION ALL
+    SELECT o.shift_id, 'service', NULL,
+           SUM((COALESCE(o.price_unit, 0) - COALESCE(o.discount, 0)) * COALESCE(o.quantity, 0))
+      FROM shift_other_sale_line o WHERE o.shift_id IN %(shift_ids)s GROUP BY o.shift_id
+    UNION ALL
+    SELECT c.shift_id, 'credit', NULL,
+           SUM((COALESCE(c.price_unit, 0) - COALESCE(c.discount, 0)) * COALESCE(c.quantity, 0))
+      FROM shift_credit_sale_line c WHERE c.shift_id IN %(shift_ids)s GROUP BY c.shift_id
+    UNION ALL
+    SELECT g.shift_id, 'rtt', NULL, SUM(COALESCE(g.rtt, 0) * COALESCE(g.price_unit, 0))
+      FROM shift_gun_sale_line g WHERE g.shift_id IN %(shift_ids)s GROUP BY g.shift_id
+    UNION ALL
+    SELECT discounts.shift_id, 'discount', NULL, SUM(discounts.discount)
+      FROM (SELECT shift_id, discount FROM shift_dry_sale_line WHERE shift_id IN %(shift_ids)s
+            UNION ALL
+            SELECT shift_id, discount FROM shift_other_sale_line WHERE shift_id IN %(shift_ids)s
+            UNION ALL
+            SELECT shift_id, discount FROM shift_credit_sale_line WHERE shift_id IN %(shift_ids)s
+            UNION ALL
+            SELECT shift_id, discount FROM shift_direct_sale_line WHERE shift_id IN %(shift_ids)s
+           ) discounts
+     GROUP BY discounts.shift_id
+    UNION ALL
+    SELECT e.shift_id, 'expenses', NULL, SUM(e.amount)
+      FROM shift_expense_line e WHERE e.shift_id IN %(shift_ids)s GROUP BY e.shift_id
+    UNION ALL
+    SELECT p.shift_id, 'payment', p.journal_id, SUM(p.amount)
+      FROM shift_payment_line p WHERE p.shift_id IN %(shift_ids)s GROUP BY p.shift_id, p.journal_id
+"""
+
+DAILY_SUMMARY_BOLDED = [
+    'TOTAL GROSS INCOME', 'TOTAL NET SALES (Gross Sales - Deductions)',
+    'TOTAL CASH EXPECTED FOR THE DAY', 'CASH AT HAND/CASH CARRIED FORWARD',
+]
 
 
 class StationShiftReports(models.Model):
     _inherit = 'station.shift'
 
-    @api.model
     def _get_daily_summary_report(self):
         self.ensure_one()
-        wet = sum(self.summary_line.mapped('wet_quantity'))
-        dry = sum(self.dry_sale_line.mapped('amount'))
-        service = sum(self.other_sale_line.mapped('amount'))
-        collections = sum(self.summary_line.mapped('collections'))
-
-        rtt = self.gun_sale_line.filtered('rtt').mapped(lambda g: (g.rtt, g.price_unit))
-        dry_discount = sum(self.dry_sale_line.mapped('discount'))
-        other_discount = sum(self.other_sale_line.mapped('discount'))
-        credit_discount = sum(self.credit_sale_line.mapped('discount'))
-        direct_discount = sum(self.direct_sale_line.mapped('discount'))
-
-        payments = {'Less (-): Credit Sales': sum(self.credit_sale_line.mapped('amount'))}
-        payment_modes = self.station_id.payment_mode_ids - self.station_id.unbanked_journal_id
-        for mode in payment_modes:
-            payments[f'Less (-): {mode.name} Sales'] = sum(
-                self.payment_line.filtered(lambda p: p.journal_id == mode).mapped('amount'))
-
-        data = OrderedDict({
-            'FUEL SALES': wet,
-            'Add (+): DRY STOCK SALES': dry,
-            'Add (+): SERVICE SALES': service,
-            'Add (+): CASH COLLECTIONS': collections,
-            'TOTAL GROSS INCOME': wet + dry + service + collections,
-            'DEDUCTIONS': '',
-            'Less (-): Fuel Transfers, Pump Test/ RTT & Gen. Fuel': sum(map(lambda r: r[0] * r[1], rtt)),
-            'Less (-/+): Price Difference': 0,
-            'Less (-): Discounts': dry_discount + other_discount + credit_discount + direct_discount,
-            'Less (-): Expenses': sum(self.expense_line.mapped('amount')),
-            'TOTAL NET SALES (Gross Sales - Deductions)': sum(self.summary_line.mapped('total_sales'))
-        })
-        data.update(payments)
-        data['Attendant Excess/ Short +/-'] = sum(self.summary_line.mapped('variance'))
-        data['TOTAL CASH EXPECTED FOR THE DAY'] = self.cash_collected
-        data['Less (-): Cash Banked'] = self.cash_banked
-        data['Add:B/F +/-'] = self.opening_balance
-        data['CASH AT HAND/CASH CARRIED FORWARD'] = self.closing_balance
-        bolded = ['TOTAL GROSS INCOME', 'TOTAL NET SALES (Gross Sales - Deductions)', 
-                  'TOTAL CASH EXPECTED FOR THE DAY', 'CASH AT HAND/CASH CARRIED FORWARD']
-        return data, bolded
+        return self._get_daily_summary_reports()[self.id]
+
+    def _get_daily_summary_reports(self):
+        """ Compute the daily summary of every shift in ``self`` with a single grouped query.
+
+        Returns ``{shift_id: (data, bolded)}``.
+        """
+        totals = defaultdict(lambda: defaultdict(float))
+        payments = defaultdict(lambda: defaultdict(float))
+        if self.ids:
+            self.env.flush_all()
+            self.env.cr.execute(DAILY_SUMMARY_QUERY, {'shift_ids': tuple(self.ids)})
+            for shift_id, key, journal_id, amount in self.env.cr.fetchall():
+                if journal_id:
+                    payments[shift_id][journal_id] += amount or 0
+                else:
+                    totals[shift_id][key] += amount or 0
+
+        # payment modes are read once per station, not per printed shift
+        payment_modes = {
+            station: station.payment_mode_ids - station.unbanked_journal_id
+            for station in self.station_id
+        }
+
+        summaries = {}
+        for rec in self:
+            values = totals[rec.id]
+            wet, dry, service, collections = values['wet'], values['dry'], values['service'], values['collections']
+
+            data = OrderedDict({
+                'FUEL SALES': wet,
+                'Add (+): DRY STOCK SALES': dry,
+                'Add (+): SERVICE SALES': service,
+                'Add (+): CASH COLLECTIONS': collections,
+                'TOTAL GROSS INCOME': wet + dry + service + collections,
+                'DEDUCTIONS': '',
+                'Less (-): Fuel Transfers, Pump Test/ RTT & Gen. Fuel': values['rtt'],
+                'Less (-/+): Price Difference': 0,
+                'Less (-): Discounts': values['discount'],
+                'Less (-): Expenses': values['expenses'],
+                'TOTAL NET SALES (Gross Sales - Deductions)': values['total_sales'],
+            })
+            data['Less (-): Credit Sales'] = values['credit']
+            for mode in payment_modes.get(rec.station_id, []):
+                data[f'Less (-): {mode.name} Sales'] = payments[rec.id][mode.id]
+            data['Attendant Excess/ Short +/-'] = values['variance']
+            data['TOTAL CASH EXPECTED FOR THE DAY'] = rec.cash_collected
+            data['Less (-): Cash Banked'] = rec.cash_banked
+            data['Add:B/F +/-'] = rec.opening_balance
+            data['CASH AT HAND/CASH CARRIED FORWARD'] = rec.closing_balance
+            summaries[rec.id] = (data, DAILY_SUMMARY_BOLDED)
+        return summaries
+
+
+class BalanceSheetReport(models.AbstractModel):
+    _name = 'report.oo_fuel_management_system.balance_sheet_report'
+    _description = 'Shift Balance Sheet Report'
+
+    @api.model
+    def _get_report_values(self, docids, data=None):
+        docs = self.env['station.shift'].browse(docids)
+        return {
+            'doc_ids': docids,
+            'doc_model': 'station.shift',
+            'docs': docs,
+            'data': data,
+            'summaries': docs._get_daily_summary_reports(),
+        }
@@ -0,0 +1,2 @@
+from . import test_daily_stats
+from . import test_query_plans
@@ -0,0 +1,53 @@
+from odoo import fields
+from odoo.tests.common import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestDailyStats(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        company = cls.company_data['company']
+        warehouse = cls.env['stock.warehouse'].search([('company_id', '=', company.id)], limit=1)
+        bank_journal = cls.company_data['default_journal_bank']
+        cash_journal = cls.company_data['default_journal_cash']
+        cls.station = cls.env['station.station'].create({
+            'name': 'Test Station',
+            'code': 'TST',
+            'company_id': company.id,
+            'warehouse_id': warehouse.id,
+            'journal_ids': [(6, 0, bank_journal.ids)],
+            'payment_mode_ids': [(6, 0, cash_journal.ids)],
+            'petty_cash_journal_id': cash_journal.id,
+            'unbanked_journal_id': cash_journal.id,
+            'expense_journal_id': cls.company_data['default_journal_misc'].id,
+            'pricelist_id': cls.env['product.pricelist'].create({'name': 'Station Prices'}).id,
+            'operation_type_id': warehouse.in_type_id.id,
+            'dry_stock_location_id': warehouse.lot_stock_id.id,
+            'liability_account_id': cls.company_data['default_account_assets'].id,
+            'loss_account_id': cls.company_data['default_account_payable'].id,
+        })
+        cls.shift_type = cls.env['station.shift.type'].create({'name': 'Day', 'sequence': 1})
+
+    def _get_stats(self, shift):
+        return self.env['fms.daily.stat'].search([('station_id', '=', shift.station_id.id), ('date', '=', shift.date)])
+
+    def test_reopened_shift_leaves_statistics(self):
+        shift = self.env['station.shift'].create({
+            'station_id': self.station.id,
+            'type_id': self.shift_type.id,
+            'date': fields.Date.today(),
+            'currency_id': self.station.currency_id.id,
+            'state': 'running',
+        })
+        self.assertFalse(self._get_stats(shift))
+
+        shift.write({'state': 'done'})
+        self.assertTrue(self._get_stats(shift), "a done shift is counted in the daily statistics")
+
+        shift.action_draft()
+        self.assertEqual(shift.state, 'running')
+        self.assertFalse(self._get_stats(shift), "a reopened shift is no longer counted")
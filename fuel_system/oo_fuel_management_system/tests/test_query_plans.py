@@ -0,0 +1,73 @@
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools import SQL
+
+from ..models.report_cache import REPORT_VERSION_QUERY, REPORT_VERSION_TABLES
+from ..models.shift import SHIFT_SUMMARY_QUERY
+
+
+@tagged('post_install', '-at_install')
+class TestQueryPlans(TransactionCase):
+    """ The hot shift queries must be answered from the indexes declared for them. """
+
+    def setUp(self):
+        super().setUp()
+        # test databases are too small for the planner to prefer an index on its own
+        self.env.cr.execute("SET LOCAL enable_seqscan = off")
+
+    def _explain(self, query, params=None):
+        self.env.cr.execute(SQL("EXPLAIN %s", query) if isinstance(query, SQL) else "EXPLAIN " + query, params)
+        return '\n'.join(row[0] for row in self.env.cr.fetchall())
+
+    def assertIndexUsed(self, plan, index_name):
+        self.assertIn(index_name, plan, f"{index_name} is not used by the plan:\n{plan}")
+
+    def test_shift_summary_query(self):
+        plan = self._explain(SHIFT_SUMMARY_QUERY, {'shift_ids': (0,)})
+        for table in ('shift_gun_sale_line', 'shift_dry_sale_line', 'shift_other_sale_line',
+                      'shift_credit_sale_line', 'shift_direct_sale_line', 'shift_collection_line',
+                      'shift_expense_line', 'shift_payment_line'):
+            self.assertIndexUsed(plan, f'{table}__shift_id_index')
+
+    def test_shift_history_lookup(self):
+        query = self.env['shift.history']._search([
+            ('station_id', '=', 0),
+            ('date', '=', '2024-01-01'),
+            ('type_id', '=', 0),
+            ('shift_id', '=', False),
+        ])
+        self.assertIndexUsed(self._explain(query.select()), 'shift_history_station_date_type_uniq')
+
+    def test_shift_period_lookup(self):
+        query = self.env['station.shift']._search([
+            ('station_id', '=', 0),
+            ('date', '=', '2024-01-01'),
+            ('type_id', '=', 0),
+            ('state', '!=', 'cancelled'),
+        ])
+        self.assertIndexUsed(self._explain(query.select()), 'station_shift_station_date_type_state_idx')
+
+    def test_unprocessed_move_lines(self):
+        # domain of receive.move.wizard.move_lines
+        query = self.env['stock.move.line']._search([
+            ('location_dest_id', '=', 0),
+            ('station_processed', '=', False),
+            ('state', '=', 'done'),
+        ])
+        self.assertIndexUsed(self._explain(query.select()), 'stock_move_line_station_unprocessed_idx')
+
+    def test_shift_links(self):
+        for model in ('sale.order', 'account.move', 'account.payment', 'stock.picking', 'stock.move.line'):
+            query = self.env[model]._search([('shift_id', '=', 0)])
+            self.assertIndexUsed(self._explain(query.select()), f'{self.env[model]._table}__shift_id_index')
+
+    def test_report_version_query(self):
+        # the version is computed on every report request, cache hits included
+        tables = REPORT_VERSION_TABLES + ['sale_order', 'sale_order_line', 'account_move']
+        for station_ids in (None, [0]):
+            plan = self._explain(REPORT_VERSION_QUERY, {
+                'station_ids': station_ids,
+                'date_from': '2024-01-01',
+                'date_to': '2024-12-31',
+            })
+            for table in tables:
+                self.assertNotIn(f'Seq Scan on {table} ', plan, f"{table} is scanned by the plan:\n{plan}")
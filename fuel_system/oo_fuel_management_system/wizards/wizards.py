@@ -1,14 +1,18 @@
 import base64
+import datetime
 import logging
 import os
+import re
 import tempfile
-import openpyxl as xl
-from collections import defaultdict
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from odoo import models, fields, api
 import xlsxwriter
-from io import BytesIO
+from xlsxwriter.utility import xl_col_to_name
+
+from ..models.daily_stats import STAT_LINES_QUERY
+from ..models.shift import STAT_SHIFT_STATES
 
 
 _logger = logging.getLogger(__name__)
@@ -18,18 +22,240 @@ WET_SUMMARY_COLS = [
     'Cumulative Variance', 'Cumulative Sales', 'Cumulative Percentage (%)'
 ]
 
+REPORT_BATCH_SIZE = 2000
+
+# Stations whose report sections are prepared concurrently, each on its own cursor. It also bounds
+# the stations whose rows are held in memory until written.
+MULTI_STATION_WORKERS = 4
+
+# Daily stock movement per tank: the opening stock is the first shift's and the closing stock the
+# last dip of the day. Columns after max_volume follow WET_SUMMARY_COLS.
+WET_SUMMARY_QUERY = """
+    WITH daily AS (
+        SELECT stst.tank_id, s.date,
+               (array_agg(COALESCE(stst.opening_qty, 0) ORDER BY sst.sequence, s.id))[1] AS opening,
+               SUM(COALESCE(stst.received_qty, 0)) AS deliveries,
+               SUM(COALESCE(stst.sales_qty, 0)) AS sales,
+               (array_agg(COALESCE(stst.closing_dip_qty, 0) ORDER BY sst.sequence DESC, s.id DESC))[1] AS closing
+          FROM shift_tank_stock_take stst
+          JOIN station_shift s ON s.id = stst.shift_id
+          JOIN station_shift_type sst ON sst.id = s.type_id
+         WHERE s.station_id = %(station_id)s
+           AND s.date BETWEEN %(date_from)s AND %(date_to)s
+           AND s.state NOT IN ('cancelled', 'draft')
+         GROUP BY stst.tank_id, s.date
+    ), movements AS (
+        SELECT d.*,
+               d.opening + d.deliveries - d.sales AS book,
+               d.closing - (d.opening + d.deliveries - d.sales) AS variance
+          FROM daily d
+    )
+    SELECT m.tank_id, t.name, t.max_volume,
+           m.date, m.opening, m.deliveries, m.sales, m.book, m.closing, m.variance,
+           SUM(m.variance) OVER w,
+           SUM(m.sales) OVER w,
+           COALESCE(ROUND((100 * SUM(m.variance) OVER w / NULLIF(SUM(m.sales) OVER w, 0))::numeric, 1), 0)
+      FROM movements m
+      JOIN station_tank t ON t.id = m.tank_id
+    WINDOW w AS (PARTITION BY m.tank_id ORDER BY m.date)
+     ORDER BY t.name, m.tank_id, m.date
+"""
+
 CASH_SUMMARY_COLS = [
     'DATE', 'PMS', 'PMS AMOUNT', 'AGO', 'AGO AMOUNT', 'BIK', 'BIK AMOUNT', 'LTRS', 'TOTAL AMNT', 'LUBES', 'LPG SALES', 'OTHERS',
     'RECEIPTS', 'TOTAL INCOME', 'CREDIT SALES', 'RTT', 'OTHER EXP.', 'PAYMENTS', 'EXP.BANKING', 'ACT BANKING', 'DIFF' 
 ]
 
+CASH_SUMMARY_FORMULAS = {
+    'LTRS': lambda row: f'=B{row}+D{row}+F{row}',
+    'TOTAL AMNT': lambda row: f'=C{row}+E{row}+G{row}',
+    'TOTAL INCOME': lambda row: f'=SUM(I{row}:M{row})',
+    'EXP.BANKING': lambda row: f'=N{row}-O{row}-P{row}-Q{row}',
+    'DIFF': lambda row: f'=S{row}-R{row}',
+}
+
+CASH_SUMMARY_PRODUCT_CODES = ('PMS', 'AGO', 'BIK')
+
+# One (date, column, amount) row per cash summary column, columns named as in CASH_SUMMARY_COLS.
+# Shifts in STAT_SHIFT_STATES are read from the materialized daily statistics, the few others
+# (draft, running or cancelled) aggregated from their lines the same way.
+CASH_SUMMARY_QUERY = f"""
+    WITH shifts AS (
+        SELECT s.id, s.station_id, s.date, s.cash_banked
+          FROM station_shift s
+         WHERE s.station_id = %(station_id)s
+           AND s.date BETWEEN %(date_from)s AND %(date_to)s
+           AND s.state NOT IN %(states)s
+    ), open_stats AS ({STAT_LINES_QUERY}
+    ), stats AS (
+        SELECT ds.date, ds.category, ds.quantity, ds.amount, pp.default_code, pt.stock_type
+          FROM (SELECT date, product_id, category, quantity, amount
+                  FROM fms_daily_stat
+                 WHERE station_id = %(station_id)s
+                   AND date BETWEEN %(date_from)s AND %(date_to)s
+                UNION ALL
+                SELECT date, product_id, category, quantity, amount
+                  FROM open_stats) ds
+          LEFT JOIN product_product pp ON pp.id = ds.product_id
+          LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+    )
+    SELECT date, default_code, SUM(quantity)
+      FROM stats
+     WHERE category IN ('fuel', 'direct') AND default_code IN %(codes)s
+     GROUP BY date, default_code
+    UNION ALL
+    SELECT date, default_code || ' AMOUNT', SUM(amount)
+      FROM stats
+     WHERE category IN ('fuel', 'direct') AND default_code IN %(codes)s
+     GROUP BY date, default_code
+    UNION ALL
+    SELECT date, CASE stock_type WHEN 'lube' THEN 'LUBES' ELSE 'LPG SALES' END, SUM(amount)
+      FROM stats
+     WHERE category = 'dry' AND stock_type IN ('lube', 'lpg')
+     GROUP BY 1, 2
+    UNION ALL
+    SELECT date, 'OTHERS', SUM(amount)
+      FROM stats
+     WHERE category = 'other' AND stock_type = 'other'
+     GROUP BY date
+    UNION ALL
+    SELECT date, 'RTT', SUM(quantity)
+      FROM stats
+     WHERE category = 'rtt'
+     GROUP BY date
+    UNION ALL
+    SELECT date,
+           CASE category
+                WHEN 'collection' THEN 'RECEIPTS'
+                WHEN 'credit' THEN 'CREDIT SALES'
+                WHEN 'expense' THEN 'OTHER EXP.'
+                WHEN 'payment' THEN 'PAYMENTS'
+                ELSE 'ACT BANKING'
+           END,
+           SUM(amount)
+      FROM stats
+     WHERE category IN ('collection', 'credit', 'expense', 'payment', 'banking')
+     GROUP BY 1, 2
+    ORDER BY 1
+"""
+
+DAILY_REPORT_COLS = ['Customer', 'Invoice No', 'Vehicle', 'Product', 'Quantity']
+
+# Order lines of the shifts in range with the first customer invoice of their order, and the
+# vehicles recorded on the credit sales the order line was made from.
+DAILY_REPORT_QUERY = """
+    WITH orders AS (
+        SELECT so.id, so.partner_id, so.shift_id, so.vehicle, s.date
+          FROM station_shift s
+          JOIN sale_order so ON so.shift_id = s.id
+         WHERE (%(station_id)s IS NULL OR s.station_id = %(station_id)s)
+           AND s.date BETWEEN %(date_from)s AND %(date_to)s
+    ), invoices AS (
+        SELECT DISTINCT ON (sol.order_id) sol.order_id, am.name
+          FROM orders o
+          JOIN sale_order_line sol ON sol.order_id = o.id
+          JOIN sale_order_line_invoice_rel rel ON rel.order_line_id = sol.id
+          JOIN account_move_line aml ON aml.id = rel.invoice_line_id
+          JOIN account_move am ON am.id = aml.move_id
+         WHERE am.move_type IN ('out_invoice', 'out_refund')
+         ORDER BY sol.order_id, am.id
+    )
+    SELECT COALESCE(p.name, 'Unknown'),
+           COALESCE(inv.name, 'N/A'),
+           COALESCE(credit.vehicle_no, o.vehicle, 'N/A'),
+           COALESCE(pt.name->>%(lang)s, pt.name->>'en_US', 'Unknown'),
+           COALESCE(sol.product_uom_qty, 0)
+      FROM orders o
+      JOIN sale_order_line sol ON sol.order_id = o.id AND sol.display_type IS NULL
+      LEFT JOIN res_partner p ON p.id = o.partner_id
+      LEFT JOIN invoices inv ON inv.order_id = o.id
+      LEFT JOIN product_product pp ON pp.id = sol.product_id
+      LEFT JOIN product_template pt ON pt.id = pp.product_tmpl_id
+      LEFT JOIN LATERAL (
+            SELECT string_agg(DISTINCT c.vehicle_no, ', ') AS vehicle_no
+              FROM shift_credit_sale_line c
+             WHERE c.shift_id = o.shift_id
+               AND c.partner_id = o.partner_id
+               AND c.product_id = sol.product_id
+           ) credit ON TRUE
+     ORDER BY o.date, o.id, sol.sequence, sol.id
+"""
+
 CREDIT_SUMMARY_COLS = [
     'Date', 'Station', 'LPO', 'Vehicle No.', 'Invoice', 'Account Number', 'Account Name', 'Product', 
     'LTRS/PCS', 'Customer Rate', 'Amount'
 ]
 
-MID_FONT = Font(name='Arial', bold=True, size=11)
-NORMAL_FONT = Font(name='Arial', size=10)
+REPORT_FORMATS = {
+    'mid': {'font_name': 'Arial', 'bold': True, 'font_size': 11},
+    'normal': {'font_name': 'Arial', 'font_size': 10},
+}
+
+REPORT_DATE_FORMAT = 'dd-mm-yyyy'
+
+
+class XlsxReportWriter:
+    """ Row-wise xlsx writer streaming to a file in xlsxwriter's constant memory mode.
+
+    Rows are flushed to disk as soon as the next one of the same sheet starts, so each sheet must
+    be written top to bottom. Formula cells are given as callables receiving the spreadsheet
+    (1-based) row, dates are written as date cells.
+    """
+
+    def __init__(self, path):
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self.formats = {name: self.workbook.add_format(props) for name, props in REPORT_FORMATS.items()}
+        self.date_formats = {
+            name: self.workbook.add_format(dict(props, num_format=REPORT_DATE_FORMAT))
+            for name, props in REPORT_FORMATS.items()
+        }
+        self.sheet = None
+        self.row = 0
+        self._sheet_rows = {}
+
+    def add_sheet(self, name=None):
+        sheet = self.workbook.add_worksheet(name)
+        self.select_sheet(sheet)
+        return sheet
+
+    def select_sheet(self, sheet):
+        """ Continue writing on ``sheet``, below the last row written on it. """
+        if self.sheet is not None:
+            self._sheet_rows[self.sheet] = self.row
+        self.sheet = sheet
+        self.row = self._sheet_rows.get(sheet, 0)
+
+    def write_row(self, values, style='normal'):
+        """ Write ``values`` on the next row and return its spreadsheet row number. """
+        excel_row = self.row + 1
+        for col, value in enumerate(values):
+            if callable(value):
+                value = value(excel_row)
+            if isinstance(value, datetime.date):
+                self.sheet.write_datetime(self.row, col, value, self.date_formats[style])
+            else:
+                self.sheet.write(self.row, col, value, self.formats[style])
+        self.row += 1
+        return excel_row
+
+    def write_merged(self, ranges, style='mid'):
+        """ Write ``(first_col, last_col, value)`` merged ranges on the next row. """
+        for first_col, last_col, value in ranges:
+            self.sheet.merge_range(self.row, first_col, self.row, last_col, value, self.formats[style])
+        self.row += 1
+
+    def write_totals(self, columns, start_row, end_row, label='TOTALS'):
+        """ Write a row summing ``columns[1:]`` between the spreadsheet rows given. """
+        self.write_row([label] + [
+            f'=SUM({xl_col_to_name(index)}{start_row}:{xl_col_to_name(index)}{end_row})'
+            for index in range(1, len(columns))
+        ], style='mid')
+
+    def skip(self, count=1):
+        self.row += count
+
+    def close(self):
+        self.workbook.close()
 
 
 class FmsAnalysis(models.TransientModel):
@@ -47,6 +273,9 @@ class FmsAnalysis(models.TransientModel):
     date_to = fields.Date(string='Date To', default=fields.Date.today())
     station_id = fields.Many2one(
         'station.station', string='Station', default=_default_station_id)
+    station_ids = fields.Many2many(
+        'station.station', string='Stations',
+        help="Report on several stations at once: one sheet per station plus a consolidated sheet.")
     report_type = fields.Selection(string='Report Type', 
                                    selection=[
                                        ('wet_summary', 'Wet Summary'),
@@ -63,202 +292,122 @@ class FmsAnalysis(models.TransientModel):
             'credit_summary': self._make_credit_summary_report,
             'daily_report':self._make_daily_report,
         }[report_type]
+
+    def _section_mappings(self, report_type):
+        """ Return the data preparation method name, the section writer and the file name of a
+        report type supporting the multi-station mode.
+        """
+        return {
+            'wet_summary': ('_prepare_wet_summary_data', self._write_wet_summary_section, 'Wet Stock Summary Report'),
+            'cash_summary': ('_prepare_cash_summary_report', self._write_cash_summary_section, 'Cash Summary Report'),
+            'daily_report': ('_prepare_daily_report_data', self._write_daily_report_section, 'Daily Sales Report'),
+        }[report_type]
+
+    def _is_multi_station(self):
+        # the credit summary always covers every station
+        return bool(self.station_ids) and self.report_type != 'credit_summary'
     
-    def _prepare_wet_summary_data(self):
-        values = {}
-        query = f"""
-            select 
-                sst.sequence, 
-                s.date, 
-                stst.shift_id, 
-                st.name as tank, 
-                st.max_volume, 
-                stst.opening_qty,
-                stst.received_qty,
-                stst.sales_qty, 
-                stst.closing_dip_qty
-            from shift_tank_stock_take stst
-            join station_shift s on stst.shift_id = s.id 
-            join station_shift_type sst on sst.id = s.type_id 
-            join station_tank st on st.id = stst.tank_id
-            where 
-                s.date >= '{self.date_from}' and
-                s.date <= '{self.date_to}' and
-                s.station_id = {self.station_id.id} and
-                s.state not in {('cancelled', 'draft')}
-            order by s.date, sst.sequence;
+    def _named_cursor(self, name):
+        """ Return a psycopg2 named (server-side) cursor ``name`` on the connection of the
+        current transaction, or None when the environment cursor does not expose one.
+
+        Odoo has no public API for server-side cursors, so this is the only place reaching
+        for the private ``Cursor._cnx``. Test cursors, for one, do not have it. The named
+        cursor shares the transaction and sees its flushed changes, while its result stays
+        on the server until fetched.
         """
-        self.env.cr.execute(query)
-        dippings = self.env.cr.dictfetchall()
-        
-        for dip in dippings:
-            shift_date = dip.get('date')
-            tank = dip.get('tank')
-            val = {
-                    'Date': shift_date,
-                    'Opening Stock': dip.get('opening_qty') or 0,
-                    'Deliveries': dip.get('received_qty') or 0,
-                    'Sales': dip.get('sales_qty') or 0,
-                    'Book Stock': lambda row: f'=B{row}+C{row}-D{row}',
-                    'Closing Stock': dip.get('closing_dip_qty') or 0,
-                    'Variance Loss/Gain': lambda row: f'=F{row}-E{row}',
-                    'Cumulative Variance': lambda row: f'=IFERROR(H{row-1}+G{row}, G{row})',
-                    'Cumulative Sales': lambda row: f'=IFERROR(I{row-1}+D{row}, D{row})',
-                    'Cumulative Percentage (%)': lambda row: f'=IFERROR(round(100 * H{row}/I{row}, 1), 0)'
-                }
-            if values.get(tank):
-                if values[tank].get(shift_date):
-                    values[tank][shift_date]['Deliveries'] += dip.get('received_qty') or 0
-                    values[tank][shift_date]['Sales'] += dip.get('sales_qty') or 0
-                    values[tank][shift_date]['Closing Stock'] += dip.get('closing_dip_qty') or 0 
-                else:
-                    values[tank][shift_date] = val
-            else:
-                values[tank] = {shift_date: val, 'volume': dip.get('max_volume')}
-
-        return values
-
-    def _make_wet_summary_report(self, wb):
-        ws = wb.active
-        fr = 1
-        filename = 'Wet Stock Summary Report'
-        tanked_values = self._prepare_wet_summary_data()
-        for tank, tank_vals in tanked_values.items():
-            ws[f'A{fr}'] = f'Tank: {tank}'
-            ws.merge_cells(f'A{fr}:F{fr}')
-            ws[f'A{fr}'].font = MID_FONT
-            
-            ws[f'G{fr}'] = f"Capacity: {tank_vals.pop('volume', 0)}"
-            ws.merge_cells(f'G{fr}:J{fr}')
-            ws[f'G{fr}'].font = MID_FONT
-            
-            fr += 1
-            # Insert columns (after each tank, add columns)
-            for index, col in enumerate(WET_SUMMARY_COLS, start=1):
-                letter = get_column_letter(index)
-                ws[f'{letter}{fr}'] = col
-                ws[f'{letter}{fr}'].font = MID_FONT
-            fr += 1
-            
-            start_fr = end_fr = fr
-            
-            # populate tank values
-            for val in tank_vals.values():
-                for index, col in enumerate(WET_SUMMARY_COLS, start=1):
-                    letter = get_column_letter(index)
-                    if callable(val.get(col)):
-                        ws[f'{letter}{fr}'] = val.get(col).__call__(fr)
-                    else:
-                        ws[f'{letter}{fr}'] = val.get(col)
-                    ws[f'{letter}{fr}'].font = NORMAL_FONT
-                fr += 1
-            end_fr = fr -1
-            
-            # populate totals per tank
-            ws[f'A{fr}'] = 'TOTALS'
-            ws[f'A{fr}'].font = MID_FONT
-            for index, col in enumerate(WET_SUMMARY_COLS[1:], start=2):
-                    letter = get_column_letter(index)
-                    ws[f'{letter}{fr}'] = f"=SUM({letter}{start_fr}:{letter}{end_fr})"
-                    ws[f'{letter}{fr}'].font = MID_FONT
-            fr += 2
-        return wb, filename
+        cnx = getattr(self.env.cr, '_cnx', None)
+        return cnx.cursor(name) if cnx is not None else None
+
+    def _stream_query(self, name, query, params):
+        """ Yield the rows of ``query`` in batches of REPORT_BATCH_SIZE, fetched through the
+        named server-side cursor ``name`` when available.
+
+        The fallback fetches the batches from the environment cursor, which then holds the
+        whole result: no other query may run on it until the rows are consumed.
+        """
+        self.env.flush_all()
+        cursor = self._named_cursor(name)
+        if cursor is None:
+            self.env.cr.execute(query, params)
+            while rows := self.env.cr.fetchmany(REPORT_BATCH_SIZE):
+                yield from rows
+            return
+        with cursor:
+            cursor.execute(query, params)
+            while rows := cursor.fetchmany(REPORT_BATCH_SIZE):
+                yield from rows
+
+    def _prepare_wet_summary_data(self):
+        """ Yield the daily rows of WET_SUMMARY_QUERY. """
+        return self._stream_query('fms_wet_summary', WET_SUMMARY_QUERY, {
+            'station_id': self.station_id.id,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+        })
+
+    def _make_wet_summary_report(self, writer):
+        writer.add_sheet('Wet Stock Summary')
+        self._write_wet_summary_section(writer, self._prepare_wet_summary_data())
+        return 'Wet Stock Summary Report'
+
+    def _write_wet_summary_section(self, writer, rows):
+        current_tank = start_row = end_row = None
+        for tank_id, tank, volume, *values in rows:
+            if tank_id != current_tank:
+                if current_tank is not None:
+                    writer.write_totals(WET_SUMMARY_COLS, start_row, end_row)
+                    writer.skip()
+                current_tank = tank_id
+                writer.write_merged([
+                    (0, 5, f'Tank: {tank}'),
+                    (6, 9, f'Capacity: {volume or 0}'),
+                ])
+                writer.write_row(WET_SUMMARY_COLS, style='mid')
+                start_row = writer.row + 1
+            end_row = writer.write_row(values)
+        if current_tank is not None:
+            writer.write_totals(WET_SUMMARY_COLS, start_row, end_row)
 
     def _prepare_cash_summary_report(self):
-        data = defaultdict(dict)
-        shifts = self.env['station.shift'].search(
-            [('date', '>=', self.date_from), 
-             ('date', '<=', self.date_to),
-             ('station_id', '=', self.station_id.id)], order='date asc')
-        for shift in shifts:
-            gun_pms = shift.gun_sale_line.filtered(lambda g: g.tank_id.product_id.default_code == 'PMS')
-            gun_ago = shift.gun_sale_line.filtered(lambda g: g.tank_id.product_id.default_code == 'AGO')
-            gun_bik = shift.gun_sale_line.filtered(lambda g: g.tank_id.product_id.default_code == 'BIK')
-            
-            direct_bik = shift.direct_sale_line.filtered(lambda g: g.tank_id.product_id.default_code == 'BIK')
-            direct_ago = shift.direct_sale_line.filtered(lambda g: g.tank_id.product_id.default_code == 'AGO')
-            direct_pms = shift.direct_sale_line.filtered(lambda g: g.tank_id.product_id.default_code == 'PMS')
-            
-            pms_qty = sum(gun_pms.mapped('net_sales')) + sum(direct_pms.mapped('quantity'))
-            pms_amount = sum(gun_pms.mapped('amount')) + sum(direct_pms.mapped('amount'))
-            bik_qty = sum(gun_bik.mapped('net_sales')) + sum(direct_bik.mapped('quantity'))
-            bik_amount = sum(gun_bik.mapped('amount')) + sum(direct_bik.mapped('amount'))
-            ago_qty = sum(gun_ago.mapped('net_sales')) + sum(direct_ago.mapped('quantity'))
-            ago_amount = sum(gun_ago.mapped('amount')) + sum(direct_ago.mapped('amount'))
-            
-            lubes = sum(shift.dry_sale_line.filtered(lambda d: d.product_id.stock_type == 'lube').mapped('amount'))
-            lpg = sum(shift.dry_sale_line.filtered(lambda d: d.product_id.stock_type == 'lpg').mapped('amount'))
-            others = sum(shift.other_sale_line.filtered(lambda d: d.product_id.stock_type == 'other').mapped('amount'))
-            
-            vals = {
-                'DATE': shift.date.strftime('%d-%m-%Y'),
-                'PMS': pms_qty,
-                'PMS AMOUNT': pms_amount, 
-                'AGO': ago_qty,
-                'AGO AMOUNT': ago_amount,
-                'BIK': bik_qty,
-                'BIK AMOUNT': bik_amount,
-                'LTRS': lambda row: f'=B{row}+D{row}+F{row}',
-                'TOTAL AMNT': lambda row: f'=C{row}+E{row}+G{row}',
-                'LUBES': lubes,
-                'LPG SALES': lpg, 
-                'OTHERS': others,
-                'RECEIPTS': sum(shift.collection_line.mapped('amount')),
-                'TOTAL INCOME': lambda row: f'=SUM(I{row}:M{row})', 
-                'CREDIT SALES': sum(shift.credit_sale_line.mapped('amount')),
-                'RTT': sum(shift.gun_sale_line.mapped('rtt')),
-                'OTHER EXP.': sum(shift.expense_line.mapped('amount')),
-                'PAYMENTS': sum(shift.payment_line.mapped('amount')),
-                'EXP.BANKING': lambda row: f'=N{row}-O{row}-P{row}-Q{row}',
-                'ACT BANKING': shift.cash_banked,
-                'DIFF': lambda row: f'=S{row}-R{row}'
-            }
-            if data.get(shift.date):
-                for key, value in data.items():
-                    if callable(value) or key == 'DATE':
-                        continue
-                    data[shift.date][key] += value
-            else:
-                data[shift.date] = vals
+        """ Return one row per shift date, aggregated by CASH_SUMMARY_QUERY. """
+        self.env.flush_all()
+        self.env.cr.execute(CASH_SUMMARY_QUERY, {
+            'station_id': self.station_id.id,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'codes': CASH_SUMMARY_PRODUCT_CODES,
+            'states': STAT_SHIFT_STATES,
+        })
+        data = {}
+        for date, column, amount in self.env.cr.fetchall():
+            vals = data.get(date)
+            if vals is None:
+                vals = data[date] = dict.fromkeys(CASH_SUMMARY_COLS, 0)
+                vals.update(CASH_SUMMARY_FORMULAS, DATE=date)
+            vals[column] += amount or 0
         return list(data.values())
         
-    def _make_cash_summary_report(self, wb):
-        ws = wb.active
-        fr = 1
-        filename = 'Cash Summary Report'
-        for index, col in enumerate(CASH_SUMMARY_COLS, start=1):
-            letter = get_column_letter(index)
-            ws[f'{letter}{fr}'] = col
-            ws[f'{letter}{fr}'].font = MID_FONT
-        fr += 1
-        start_fr = fr
-        for val in self._prepare_cash_summary_report():
-            for index, col in enumerate(CASH_SUMMARY_COLS, start=1):
-                letter = get_column_letter(index)
-                if callable(val[col]):
-                    ws[f'{letter}{fr}'] = val[col].__call__(fr)
-                else:
-                    ws[f'{letter}{fr}'] = val[col]
-                ws[f'{letter}{fr}'].font = NORMAL_FONT
-            fr += 1
-        end_fr = fr -1
-        
-        ws[f'A{fr}'] = 'TOTALS'
-        ws[f'A{fr}'].font = MID_FONT
-        for index, col in enumerate(CASH_SUMMARY_COLS[1:], start=2):
-            letter = get_column_letter(index)
-            ws[f'{letter}{fr}'] = f"=SUM({letter}{start_fr}:{letter}{end_fr})"
-            ws[f'{letter}{fr}'].font = MID_FONT
-        return wb, filename
+    def _make_cash_summary_report(self, writer):
+        writer.add_sheet('Cash Summary')
+        self._write_cash_summary_section(writer, self._prepare_cash_summary_report())
+        return 'Cash Summary Report'
+
+    def _write_cash_summary_section(self, writer, rows):
+        writer.write_row(CASH_SUMMARY_COLS, style='mid')
+        start_row = end_row = writer.row + 1
+        for val in rows:
+            end_row = writer.write_row([val[col] for col in CASH_SUMMARY_COLS])
+        writer.write_totals(CASH_SUMMARY_COLS, start_row, end_row)
 
     def _prepare_credit_summary_data(self):
         credit_lines = self.env['shift.credit.sale.line'].search(
-            [('shift_id.date', '>=', self.date_from), ('shift_id.date', '<=', self.date_to)],
+            [('date', '>=', self.date_from), ('date', '<=', self.date_to)],
             order='date asc, station_id')
         data = []
         for line in credit_lines:
             data.append({
-                'Date': line.shift_id.date,
+                'Date': line.date,
                 'Station': line.station_id.name,
                 'LPO': line.lpo_number,
                 'Vehicle No.': line.vehicle_no,
@@ -272,142 +421,143 @@ class FmsAnalysis(models.TransientModel):
             })
         return data
   
-    def _make_credit_summary_report(self, wb):
-        ws = wb.active
-        fr = 1
-        filename = 'Credit Summary Report'
-        for index, col in enumerate(CREDIT_SUMMARY_COLS, start=1):
-            letter = get_column_letter(index)
-            ws[f'{letter}{fr}'] = col
-            ws[f'{letter}{fr}'].font = MID_FONT
-        fr += 1
+    def _make_credit_summary_report(self, writer):
+        writer.add_sheet('Credit Summary')
+        writer.write_row(CREDIT_SUMMARY_COLS, style='mid')
         for val in self._prepare_credit_summary_data():
-            for index, col in enumerate(CREDIT_SUMMARY_COLS, start=1):
-                letter = get_column_letter(index)
-                ws[f'{letter}{fr}'] = val.get(col)
-                ws[f'{letter}{fr}'].font = NORMAL_FONT
-            fr += 1
-        return wb, filename
-    
-    def _prepare_daily_sales_stock_report(self):
-        query = """
-            SELECT 
-                sst.sequence, 
-                s.date, 
-                stst.shift_id, 
-                st.name AS tank, 
-                st.max_volume, 
-                stst.opening_qty,
-                stst.received_qty,
-                stst.sales_qty, 
-                stst.closing_dip_qty,
-                scl.vehicle_no  -- Fetch vehicle from shift credit sale line
-            FROM shift_tank_stock_take stst
-            JOIN station_shift s ON stst.shift_id = s.id 
-            JOIN station_shift_type sst ON sst.id = s.type_id 
-            JOIN station_tank st ON st.id = stst.tank_id
-            LEFT JOIN shift_credit_sale_line scl ON scl.shift_id = s.id  -- Join to get vehicle
-            WHERE 
-                s.date >= %s AND
-                s.date <= %s AND
-                s.station_id = %s AND
-                s.state NOT IN ('cancelled', 'draft')
-            ORDER BY s.date, sst.sequence;
-        """
-
-        # Execute query safely with parameterized inputs
-        self.env.cr.execute(query, (self.date_from, self.date_to, self.station_id.id if self.station_id else None))
-        sales_data = self.env.cr.dictfetchall()
-
-        # Group data
-        report_data = []
-        for record in sales_data:
-            report_data.append({
-                'Date': record.get('date').strftime('%d/%m/%Y') if record.get('date') else '',
-                'Shift ID': record.get('shift_id'),
-                'Tank': record.get('tank'),
-                'Max Volume': record.get('max_volume') or 0,
-                'Opening Quantity': record.get('opening_qty') or 0,
-                'Received Quantity': record.get('received_qty') or 0,
-                'Sales Quantity': record.get('sales_qty') or 0,
-                'Closing Dip Quantity': record.get('closing_dip_qty') or 0,
-                'Vehicle': record.get('vehicle_no') or 'N/A'  # Use vehicle from shift credit sale line
-            })
-
-        return report_data
+            writer.write_row([val.get(col) for col in CREDIT_SUMMARY_COLS])
+        return 'Credit Summary Report'
     
-    def _make_daily_report(self, wb):
-        """
-        Generate the daily sales stock report in Excel format.
-        
-        Args:
-            wb: xlsxwriter.Workbook instance to write data into.
-        
-        Returns:
-            wb, filename (Workbook and filename for saving).
-        """
-
-        # Fetch all sales orders
-        records = self.env['sale.order'].search([])
-
-        # Create a worksheet
-        sheet = wb.add_worksheet("Daily Sales Report")
-
-        # Write column headers
-        headers = ["Customer", "Invoice No", "Vehicle", "Product", "Quantity"]
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header)
-
-        row = 1  # Start from the second row (0-based index)
-
-        for order in records:
-            customer = order.partner_id.name or "Unknown"
-            invoice_no = order.invoice_ids and order.invoice_ids[0].name or "N/A"
-            vehicle = order.vehicle if hasattr(order, 'vehicle') else "N/A"
+    def _prepare_daily_report_data(self):
+        """ Yield the order line rows of DAILY_REPORT_QUERY for the wizard's period and station. """
+        return self._stream_query('fms_daily_report', DAILY_REPORT_QUERY, {
+            'station_id': self.station_id.id or None,
+            'date_from': self.date_from,
+            'date_to': self.date_to,
+            'lang': self.env.lang or 'en_US',
+        })
 
-            # Fetch sale order lines
-            for line in order.order_line:
-                product = line.product_id.name or "Unknown"
-                qty = line.product_uom_qty or 0.0
+    def _make_daily_report(self, writer):
+        writer.add_sheet('Daily Sales Report')
+        self._write_daily_report_section(writer, self._prepare_daily_report_data())
+        return 'Daily Sales Report'
 
-                sheet.write(row, 0, customer)
-                sheet.write(row, 1, invoice_no)
-                sheet.write(row, 2, vehicle)
-                sheet.write(row, 3, product)
-                sheet.write(row, 4, qty)
+    def _write_daily_report_section(self, writer, rows, header=True):
+        if header:
+            writer.write_row(DAILY_REPORT_COLS, style='mid')
+        for values in rows:
+            writer.write_row(values)
 
-                row += 1
+    def _prepare_station_sections(self, stations, prepare):
+        """ Yield ``(station, rows)`` for each of ``stations`` in order, their data prepared concurrently.
 
-        return wb, "daily_sales_report.xlsx"
+        Each worker opens its own cursor and calls ``prepare`` on an in-memory copy of the
+        wizard scoped to one station, so it only sees committed data. A station is only
+        submitted once an earlier one was consumed, so at most MULTI_STATION_WORKERS stations
+        have their rows in memory.
+        """
+        registry = self.env.registry
+        uid, context = self.env.uid, dict(self.env.context)
+        values = {'report_type': self.report_type, 'date_from': self.date_from, 'date_to': self.date_to}
+
+        def prepare_section(station_id):
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                wizard = env['fms.analysis'].new(dict(values, station_id=station_id))
+                return list(getattr(wizard, prepare)())
+
+        remaining = iter(stations)
+        with ThreadPoolExecutor(max_workers=min(len(stations), MULTI_STATION_WORKERS)) as executor:
+            pending = deque((station, executor.submit(prepare_section, station.id))
+                            for station in islice(remaining, MULTI_STATION_WORKERS))
+            while pending:
+                station, future = pending.popleft()
+                rows = future.result()
+                for next_station in islice(remaining, 1):
+                    pending.append((next_station, executor.submit(prepare_section, next_station.id)))
+                yield station, rows
+
+    def _station_sheet_names(self, stations):
+        """ Return a sheet name per station. Sheet names are limited to 31 characters, without
+        []:*?/\\ and unique regardless of case, so truncated names clashing get a counter.
+        """
+        names, used = [], set()
+        for station in stations:
+            label = ' - '.join(part for part in (station.code, station.name) if part)
+            name = re.sub(r'[\[\]:*?/\\]', ' ', label)[:31].strip("'")
+            candidate, counter = name, 1
+            while candidate.lower() in used:
+                counter += 1
+                suffix = f' ({counter})'
+                candidate = name[:31 - len(suffix)] + suffix
+            used.add(candidate.lower())
+            names.append(candidate)
+        return names
+
+    def _consolidate_section(self, writer, write_section, station, rows, cash_totals):
+        """ Add the rows of ``station`` to the consolidated sheet being written.
+
+        The cash summary sums them per date into ``cash_totals`` instead, its consolidated rows
+        being written once every station is done.
+        """
+        if self.report_type == 'cash_summary':
+            for vals in rows:
+                merged = cash_totals.get(vals['DATE'])
+                if merged is None:
+                    cash_totals[vals['DATE']] = dict(vals)
+                    continue
+                for col in CASH_SUMMARY_COLS:
+                    if col != 'DATE' and not callable(vals[col]):
+                        merged[col] += vals[col]
+        elif self.report_type == 'wet_summary':
+            if writer.row:
+                writer.skip()
+            write_section(writer, ((tank_id, f'{station.name} / {tank}', volume, *values)
+                                   for tank_id, tank, volume, *values in rows))
+        else:
+            if not writer.row:
+                writer.write_row(['Station'] + DAILY_REPORT_COLS, style='mid')
+            write_section(writer, ((station.name, *values) for values in rows), header=False)
+
+    def _make_multi_station_report(self, writer):
+        """ Write a sheet per station and a consolidated sheet as the station data comes in. """
+        prepare, write_section, filename = self._section_mappings(self.report_type)
+        stations = self.station_ids.sorted('name')
+        sheets = {station: writer.add_sheet(name)
+                  for station, name in zip(stations, self._station_sheet_names(stations))}
+        consolidated = writer.add_sheet('Consolidated')
+        cash_totals = {}
+        for station, rows in self._prepare_station_sections(stations, prepare):
+            writer.select_sheet(sheets[station])
+            write_section(writer, rows)
+            writer.select_sheet(consolidated)
+            self._consolidate_section(writer, write_section, station, rows, cash_totals)
+        if self.report_type == 'cash_summary':
+            write_section(writer, [cash_totals[date] for date in sorted(cash_totals)])
+        return f'{filename} - Consolidated'
+
+    def _render_report(self, path):
+        """ Stream the report to the file at ``path`` and return its file name. """
+        writer = XlsxReportWriter(path)
+        if self._is_multi_station():
+            filename = self._make_multi_station_report(writer)
+        else:
+            filename = self._report_mappings(self.report_type)(writer)
+        writer.close()
+        return f'{filename}.xlsx'
+
+    def _get_report_stations(self):
+        # the credit summary covers every station of the period
+        if self.report_type == 'credit_summary':
+            return self.env['station.station']
+        if self._is_multi_station():
+            return self.station_ids
+        return self.station_id
 
     def action_generate_report(self):
-        """ Generate the report, store it as an attachment, and provide a download link. """
-        
-        output = BytesIO()  # Create an in-memory buffer
-        wb = xlsxwriter.Workbook(output)  # Initialize workbook
-        
-        # Fetch the appropriate report function
-        report_func = self._report_mappings(self.report_type)
-        
-        if callable(report_func):
-            wb, filename = report_func(wb)  # Generate the report
-
-        # Close the workbook to save content
-        wb.close()
-        
-        # Prepare the file for download
-        output.seek(0)
-        excel_data = output.getvalue()
-        output.close()
-
-        # Store file as an attachment
-        attachment = self.env['ir.attachment'].create({
-            'name': filename,
-            'datas': base64.b64encode(excel_data),
-            'res_model': 'fms.analysis',
-            'res_id': self.id,
-            'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        })
+        """ Return the cached report for these parameters, generating it on a miss, and provide a download link. """
+        attachment = self.env['fms.report.cache']._get_report(
+            self.report_type, self._get_report_stations(), self.date_from, self.date_to, self._render_report)
 
         # Provide download link
         return {
@@ -415,6 +565,8 @@ class FmsAnalysis(models.TransientModel):
             'url': f'/web/content/{attachment.id}?download=true',
             'target': 'self',
         }
+
+
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
 
@@ -428,8 +580,9 @@ class ReportDownload(models.TransientModel):
 
     @api.model
     def create_xls(self):
-        _, xls_path = tempfile.mkstemp(
+        fd, xls_path = tempfile.mkstemp(
             suffix='.xlsx', prefix='xlsreport.tmp.')
+        os.close(fd)
         return xls_path
 
     @api.model